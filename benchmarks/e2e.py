@@ -0,0 +1,162 @@
+"""End-to-end throughput of the tasks against local stand-in services.
+
+Starts the stand-ins from benchmarks/standins.py, points StackerBot at them
+through its config environment variables, and runs backfill, sync,
+fix-covers and repair-youtube in turn against the same synthetic
+publication. Nothing leaves the machine; state, HTTP cache and YouTube
+catalog live in a temporary directory.
+
+For every task it reports posts/minute, HTTP calls per post per service,
+Notion 429s, and p50/p95 latency of each pipeline stage as recorded by
+scraper.metrics.
+
+Usage:
+    python -m benchmarks.e2e [--posts 40] [--new-posts 5] [--notion-rps 3]
+    python -m benchmarks.e2e --json results.json
+
+Within one benchmark run, the later tasks see the transcripts the earlier
+ones cached, as they would in production.
+
+The stand-in latencies (--*-latency-ms) default to rough production
+figures. Settings from .env that are not service endpoints or paths (e.g.
+SYNC_WORKERS, NOTION_REQUESTS_PER_SECOND) still apply.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.standins import NotionStandIn, SubstackStandIn, TranscriptStandIn, World, YouTubeStandIn
+
+# The scraper.metrics counter holding the number of posts a task handled.
+TASKS = [
+    ("backfill", "tasks.backfill", "posts_imported"),
+    ("sync", "tasks.daily_sync", "posts_imported"),
+    ("fix-covers", "tasks.fix_covers", "covers_checked"),
+    ("repair-youtube", "tasks.repair_youtube", "videos_checked"),
+]
+
+
+def configure(services, workdir):
+    substack, youtube, transcript, notion = services
+    os.environ.update({
+        "NOTION_SECRET": "bench",
+        "DATABASE_ID": "bench-database",
+        "SUBSTACK_RSS_URL": f"{substack.url}/feed",
+        "SUBSTACK_NAME": "Bench",
+        "SUBSTACK_COOKIE": "substack.sid=bench",
+        "TRANSCRIPT_API_KEY": "bench",
+        "YOUTUBE_CHANNEL_ID": "UCbench",
+        "NOTION_API_URL": f"{notion.url}/v1/",
+        "YOUTUBE_FEED_URL": f"{youtube.url}/feeds/videos.xml",
+        "TRANSCRIPT_API_URL": f"{transcript.url}/api/v2/youtube/transcript",
+        "METRICS_DIR": "",
+        "METRICS_TEXTFILE_DIR": "",
+        "STATE_DB_PATH": os.path.join(workdir, "state.db"),
+        "HTTP_CACHE_DIR": os.path.join(workdir, "http"),
+        "YOUTUBE_CATALOG_PATH": os.path.join(workdir, "youtube_catalog.json"),
+        "TRANSCRIPT_CACHE_PATH": os.path.join(workdir, "transcripts.db"),
+    })
+
+
+def run_task(name, module_name, posts_counter, services):
+    import importlib
+
+    from scraper import metrics, notion_client, youtube
+
+    # Each task runs in its own process in production: start it cold.
+    youtube._catalog = None
+    notion_client._property_ids.clear()
+    metrics.reset()
+    for service in services:
+        service.reset_counts()
+
+    task = importlib.import_module(module_name)
+    start = time.perf_counter()
+    task.run()
+    elapsed = time.perf_counter() - start
+
+    summary = metrics.summary()
+    posts = summary["counters"].get(posts_counter, 0)
+    return {
+        "task": name,
+        "posts": posts,
+        "seconds": round(elapsed, 2),
+        "posts_per_min": round(posts / elapsed * 60, 1) if elapsed else 0.0,
+        "calls_per_post": {
+            s.name: round(s.counts["requests"] / posts, 2) if posts else float(s.counts["requests"])
+            for s in services
+        },
+        "notion_429s": services[3].counts["throttled"],
+        "stages": summary["stages"],
+        "counters": summary["counters"],
+    }
+
+
+def print_result(result):
+    print(f"\n== {result['task']}: {result['posts']} posts in {result['seconds']}s "
+          f"({result['posts_per_min']} posts/min, {result['notion_429s']} Notion 429s)")
+    calls = ", ".join(f"{name} {n}" for name, n in result["calls_per_post"].items())
+    print(f"   HTTP calls per post: {calls}")
+    print(f"   {'stage':<15} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage, s in result["stages"].items():
+        print(f"   {stage:<15} {s['calls']:>6} {s['p50_ms']:>9} {s['p95_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=40, help="posts in the archive before the backfill")
+    parser.add_argument("--new-posts", type=int, default=5, help="posts published before the sync")
+    parser.add_argument("--sections", type=int, default=8, help="sections per post page")
+    parser.add_argument("--hydration-kb", type=int, default=200, help="inline JSON per post page")
+    parser.add_argument("--transcript-kb", type=int, default=20)
+    parser.add_argument("--notion-rps", type=float, default=3.0, help="stand-in rate limit before 429s")
+    parser.add_argument("--substack-latency-ms", type=float, default=80)
+    parser.add_argument("--youtube-latency-ms", type=float, default=50)
+    parser.add_argument("--transcript-latency-ms", type=float, default=300)
+    parser.add_argument("--notion-latency-ms", type=float, default=150)
+    parser.add_argument("--tasks", default=",".join(name for name, _, _ in TASKS), help="comma-separated subset to run")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the tasks' own logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    world = World(posts=args.posts, sections=args.sections, hydration_kb=args.hydration_kb, transcript_kb=args.transcript_kb)
+    services = [
+        SubstackStandIn(world, args.substack_latency_ms / 1000).start(),
+        YouTubeStandIn(world, args.youtube_latency_ms / 1000).start(),
+        TranscriptStandIn(world, args.transcript_latency_ms / 1000).start(),
+        NotionStandIn(world, args.notion_latency_ms / 1000, requests_per_second=args.notion_rps).start(),
+    ]
+    notion = services[3]
+    wanted = args.tasks.split(",")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="stackerbot-bench-") as workdir:
+        configure(services, workdir)
+        try:
+            for name, module_name, posts_counter in TASKS:
+                if name not in wanted:
+                    continue
+                if name == "sync":
+                    world.publish(args.new_posts)
+                elif name == "fix-covers":
+                    notion.strip_covers()
+                result = run_task(name, module_name, posts_counter, services)
+                print_result(result)
+                results.append(result)
+        finally:
+            for service in services:
+                service.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
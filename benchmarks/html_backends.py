@@ -0,0 +1,90 @@
+"""Parity check and throughput of the HTML parser backends on post pages.
+
+Each page is converted with every installed backend and the result (blocks,
+video ids, VTT URL, cover) is compared against the golden JSON file next to
+it. By default the committed corpus in benchmarks/corpus is used: a few
+synthetic posts plus edge-case markup, with goldens reviewed by hand.
+
+Usage:
+    python -m benchmarks.html_backends [--repeat 3]
+    python -m benchmarks.html_backends --corpus saved_pages/ [--update-golden]
+
+A corpus is a directory of saved post pages (*.html) with <name>.golden.json
+files. --update-golden (re)writes them from html.parser output; review the
+diff before committing. A page without a golden fails the check.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from scraper.html_parser import BACKENDS, _available
+from scraper.substack import parse_post_html
+
+REFERENCE = "html.parser"
+CORPUS = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def _result(html, backend):
+    return json.loads(json.dumps(parse_post_html(html, backend)._asdict()))
+
+
+def load_corpus(corpus, update_golden):
+    loaded = []
+    for path in sorted(glob.glob(os.path.join(corpus, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        golden_path = path[: -len(".html")] + ".golden.json"
+        if update_golden:
+            with open(golden_path, "w") as f:
+                json.dump(_result(html, REFERENCE), f, indent=1, ensure_ascii=False)
+                f.write("\n")
+        golden = None
+        if os.path.exists(golden_path):
+            with open(golden_path, encoding="utf-8") as f:
+                golden = json.load(f)
+        loaded.append((os.path.basename(path), html, golden))
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=CORPUS, help="directory of saved post pages (*.html)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.update_golden)
+    if not pages:
+        sys.exit("No pages found.")
+    total_kb = sum(len(html) for _, html, _ in pages) / 1024
+    print(f"{len(pages)} pages, {total_kb / len(pages):.0f} KB average")
+
+    goldens = {name: golden for name, _, golden in pages}
+    failed = False
+    print(f"{'backend':<12} {'pages/sec':>10} {'parity':>8}")
+    for backend in BACKENDS:
+        if not _available(backend):
+            print(f"{backend:<12} {'not installed':>19}")
+            continue
+        mismatches = [name for name, html, golden in pages if _result(html, backend) != golden]
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for _, html, _ in pages:
+                parse_post_html(html, backend)
+        rate = len(pages) * args.repeat / (time.perf_counter() - start)
+
+        print(f"{backend:<12} {rate:>10.1f} {'ok' if not mismatches else 'FAIL':>8}")
+        for name in mismatches:
+            print(f"  {'differs from golden' if goldens[name] is not None else 'no golden (run --update-golden)'}: {name}")
+        failed = failed or bool(mismatches)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
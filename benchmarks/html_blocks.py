@@ -0,0 +1,170 @@
+"""Cost of converting post content to Notion blocks as posts get longer.
+
+html_to_notion_blocks visits each node once. The converter it replaced
+(kept below as a reference) rescanned subtrees with find()/get_text() for
+every element, which grows quadratically with nesting. Both run on the
+same parsed soup; only the conversion is timed. Parity compares the block
+types, plain text and video id of both.
+
+Usage: python -m benchmarks.html_blocks [--sections 8 64 256] [--depths 50 200 400] [--repeat 3]
+"""
+
+import argparse
+import sys
+import time
+
+from bs4 import NavigableString, Tag
+
+from benchmarks.pages import make_post_html
+from scraper.html_parser import html_to_notion_blocks, make_soup
+from scraper.utils import get_video_id_from_url
+
+
+def _legacy_rich_text(tag):
+    rich_text = []
+    for child in tag.children:
+        if isinstance(child, NavigableString):
+            if str(child):
+                rich_text.append({"type": "text", "text": {"content": str(child)[:2000]}})
+        elif isinstance(child, Tag):
+            text_content = child.get_text()
+            if not text_content:
+                continue
+            text_obj = {"type": "text", "text": {"content": text_content[:2000]}}
+            if child.name == "a" and child.get("href"):
+                text_obj["text"]["link"] = {"url": child["href"]}
+            if child.find("a"):
+                link = child.find("a")
+                if link and link.get("href"):
+                    text_obj["text"]["link"] = {"url": link["href"]}
+            rich_text.append(text_obj)
+    if not rich_text and tag.get_text().strip():
+        return [{"type": "text", "text": {"content": tag.get_text()[:2000]}}]
+    return rich_text
+
+
+def _legacy_block(element):
+    def block(kind, rt):
+        return {"type": kind, kind: {"rich_text": rt}}
+
+    if element.name == "pre":
+        return block("code", [{"type": "text", "text": {"content": element.get_text()[:2000]}}])
+    if element.name in ["h1", "h2", "h3"]:
+        rt = _legacy_rich_text(element)
+        if rt:
+            return block("heading_2" if element.name in ["h1", "h2"] else "heading_3", rt)
+    if element.name == "li":
+        rt = _legacy_rich_text(element)
+        if rt:
+            return block("bulleted_list_item", rt)
+    if element.name == "blockquote":
+        rt = _legacy_rich_text(element)
+        if rt:
+            return block("quote", rt)
+    if element.name in ("img", "figure") or element.find("img"):
+        img = element if element.name == "img" else element.find("img")
+        if img and str(img.get("src", "")).startswith("http"):
+            return {"type": "image", "image": {"type": "external", "external": {"url": img["src"]}}}
+    if element.name == "p":
+        text_content = element.get_text().strip()
+        if not text_content:
+            return None
+        if len(text_content) > 1900:
+            return block("paragraph", [{"type": "text", "text": {"content": text_content[:1900]}}])
+        rt = _legacy_rich_text(element)
+        if rt:
+            return block("paragraph", rt)
+    return None
+
+
+def legacy_html_to_notion_blocks(soup_content):
+    blocks = []
+    found_yt_id = None
+
+    def process_container(container):
+        nonlocal found_yt_id
+        for element in container.find_all(recursive=False):
+            if element.name == "iframe" and "youtube" in str(element.get("src", "")):
+                found_yt_id = get_video_id_from_url(element["src"])
+            if element.find("a") and "youtube.com/watch" in str(element.find("a").get("href", "")):
+                found_yt_id = get_video_id_from_url(element.find("a")["href"])
+            if element.name == "div" or (element.name == "a" and element.find("img")):
+                process_container(element)
+                continue
+            if element.name in ["ul", "ol"]:
+                for li in element.find_all("li", recursive=False):
+                    b = _legacy_block(li)
+                    if b:
+                        if element.name == "ol":
+                            b["type"] = "numbered_list_item"
+                            b["numbered_list_item"] = b.pop("bulleted_list_item")
+                        blocks.append(b)
+                continue
+            block = _legacy_block(element)
+            if block:
+                blocks.append(block)
+
+    process_container(soup_content)
+    return blocks, found_yt_id
+
+
+def make_nested_html(depth):
+    """Content nested `depth` divs deep, like wrapped embeds and callouts.
+    No links, so every find("a") in the old converter scans to the bottom."""
+    html = ""
+    for i in reversed(range(depth)):
+        html = f"<div><p>Level {i} <strong>holds <em>some</em> text</strong> here.</p>{html}</div>"
+    return f'<html><body><div class="available-content">{html}</div></body></html>'
+
+
+def _plain(result):
+    blocks, youtube_id = result
+    flat = []
+    for block in blocks:
+        body = block[block["type"]]
+        if block["type"] == "image":
+            flat.append(("image", body["external"]["url"]))
+        else:
+            flat.append((block["type"], "".join(segment["text"]["content"] for segment in body["rich_text"])))
+    return flat, youtube_id
+
+
+def _time(convert, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        convert(content)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sections", type=int, nargs="+", default=[8, 64, 256])
+    parser.add_argument("--depths", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * max(args.depths) + 100))
+
+    cases = [(f"{n} sections", make_post_html(seed=n, sections=n, hydration_kb=1)) for n in args.sections]
+    cases += [(f"{n} deep", make_nested_html(n)) for n in args.depths]
+
+    failed = False
+    print(f"{'content':<14} {'nodes':>7} {'blocks':>7} {'old ms':>9} {'new ms':>9} {'speedup':>8} {'parity':>7}")
+    for name, html in cases:
+        # html.parser has no nesting limit, unlike lxml
+        content = make_soup(html, "html.parser").find("div", class_="available-content")
+        nodes = sum(1 for _ in content.descendants)
+        new = html_to_notion_blocks(content)
+        parity = _plain(new) == _plain(legacy_html_to_notion_blocks(content))
+        old_ms = _time(legacy_html_to_notion_blocks, content, args.repeat)
+        new_ms = _time(html_to_notion_blocks, content, args.repeat)
+        print(
+            f"{name:<14} {nodes:>7} {len(new[0]):>7} {old_ms:>9.1f} {new_ms:>9.1f} "
+            f"{old_ms / new_ms:>7.1f}x {'ok' if parity else 'FAIL':>7}"
+        )
+        failed = failed or not parity
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
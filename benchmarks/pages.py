@@ -0,0 +1,101 @@
+"""Synthetic Substack post pages for benchmarks.
+
+The layout mirrors a real post: a <head> with og/twitter meta tags, a large
+inline hydration script, and the article in div.available-content with the
+markup html_parser handles (headings, nested formatting, lists, quotes,
+figures, code, embeds).
+"""
+
+import json
+import random
+
+WORDS = (
+    "agents model prompt context memory tools workflow team product strategy data review build ship "
+    "reason search code write lead career future open source cost speed quality evaluation"
+).split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng):
+    parts = [_sentence(rng)]
+    for _ in range(rng.randint(1, 4)):
+        kind = rng.random()
+        text = _sentence(rng, rng.randint(3, 8))
+        if kind < 0.25:
+            parts.append(f"<strong>{text}</strong>")
+        elif kind < 0.45:
+            parts.append(f"<em>{text}</em>")
+        elif kind < 0.7:
+            parts.append(f'<a href="https://example.com/{rng.randint(1, 9999)}">{text}</a>')
+        elif kind < 0.8:
+            parts.append(f'<a href="https://example.com/x"><strong>{text}</strong></a>')
+        else:
+            parts.append(f"<code>{rng.choice(WORDS)}()</code>")
+        parts.append(_sentence(rng))
+    return "<p>" + " ".join(parts) + "</p>"
+
+
+def _section(rng, index):
+    html = [f"<h2>{_sentence(rng, 5)}</h2>"]
+    for _ in range(rng.randint(2, 5)):
+        html.append(_paragraph(rng))
+    roll = rng.random()
+    if roll < 0.3:
+        items = "".join(f"<li><p>{_sentence(rng, 8)}</p></li>" for _ in range(rng.randint(2, 6)))
+        html.append(f"<ul>{items}</ul>" if rng.random() < 0.5 else f"<ol>{items}</ol>")
+    elif roll < 0.5:
+        html.append(f"<blockquote><p>{_sentence(rng, 20)}</p></blockquote>")
+    elif roll < 0.7:
+        html.append(
+            '<div class="captioned-image-container"><figure><a class="image-link" href="#">'
+            f'<img src="https://substackcdn.com/image/fetch/{index}.png" width="1456"></a>'
+            f"<figcaption>{_sentence(rng, 6)}</figcaption></figure></div>"
+        )
+    elif roll < 0.8:
+        html.append(f"<pre><code>def step_{index}():\n    return {index}\n</code></pre>")
+    elif roll < 0.85:
+        html.append('<div class="youtube-wrap"><iframe src="https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ"></iframe></div>')
+    html.append(f"<h3>{_sentence(rng, 4)}</h3>")
+    html.append(_paragraph(rng))
+    return "\n".join(html)
+
+
+def make_post_html(seed=0, sections=8, hydration_kb=200, title=None, video_id=None, vtt_url=None):
+    """A full post page; hydration_kb pads the inline JSON like real pages."""
+    rng = random.Random(seed)
+    title = title or _sentence(rng, 6)[:-1]
+    body = "\n".join(_section(rng, i) for i in range(sections))
+    if video_id:
+        body += f'\n<div class="youtube-wrap"><iframe src="https://www.youtube.com/embed/{video_id}"></iframe></div>'
+
+    hydration = {"post": {"title": title, "body_json": [_sentence(rng) for _ in range(hydration_kb * 13)]}}
+    if vtt_url:
+        hydration["post"]["videoUpload"] = {"captions": vtt_url}
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<meta property="og:title" content="{title}">
+<meta property="og:image" content="https://substackcdn.com/image/fetch/cover-{seed}.png">
+<meta name="twitter:image" content="https://substackcdn.com/image/fetch/twitter-{seed}.png">
+<link rel="stylesheet" href="https://substackcdn.com/bundle/main.css">
+</head>
+<body>
+<div id="entry"><div class="main-menu"><a href="/">Home</a><a href="/archive">Archive</a></div>
+<article class="post">
+<h1 class="post-title">{title}</h1>
+<div class="available-content"><div class="body markup" dir="auto">
+{body}
+</div></div>
+</article>
+<div class="footer"><p>Subscribe for more.</p></div>
+</div>
+<script>window._preloads = JSON.parse({json.dumps(json.dumps(hydration))})</script>
+</body>
+</html>
+"""
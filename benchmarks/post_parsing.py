@@ -0,0 +1,77 @@
+"""Scoped vs. full-document parsing of post pages, per task.
+
+parse_post_html only builds the parts of the tree a task reads (cover
+meta tags, the article container, iframes). This compares it with
+building the whole soup and extracting the same parts from it: time and
+peak memory per page, and that both give the same PostPage.
+
+Usage: python -m benchmarks.post_parsing [--pages 10] [--repeat 3] [--hydration-kb 200]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+
+from benchmarks.pages import make_post_html
+from scraper.html_parser import BACKENDS, _available, make_soup
+from scraper.substack import ALL_PARTS, COVER, VIDEO, _post_page, parse_post_html
+
+MODES = [("backfill", ALL_PARTS), ("fix_covers", (COVER,)), ("repair_youtube", (VIDEO,))]
+
+
+def full_parse(html, backend, parts):
+    return _post_page(make_soup(html, backend), html, parts)
+
+
+def _measure(parse, pages, backend, parts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html, backend, parts)
+    ms = (time.perf_counter() - start) / (repeat * len(pages)) * 1000
+
+    tracemalloc.start()
+    parse(pages[0], backend, parts)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ms, peak / 1024
+
+
+def _scoped(html, backend, parts):
+    return parse_post_html(html, backend, parts=parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hydration-kb", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = [
+        make_post_html(seed=i, hydration_kb=args.hydration_kb, vtt_url="https://substackcdn.com/v/1.vtt" if i % 2 else None)
+        for i in range(args.pages)
+    ]
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB average")
+
+    failed = False
+    print(f"{'backend':<12} {'task':<15} {'full ms':>8} {'scoped ms':>10} {'full KB':>8} {'scoped KB':>10} {'parity':>7}")
+    for backend in BACKENDS:
+        if not _available(backend):
+            continue
+        for task, parts in MODES:
+            parity = all(_scoped(html, backend, parts) == full_parse(html, backend, parts) for html in pages)
+            full_ms, full_kb = _measure(full_parse, pages, backend, parts, args.repeat)
+            scoped_ms, scoped_kb = _measure(_scoped, pages, backend, parts, args.repeat)
+            print(
+                f"{backend:<12} {task:<15} {full_ms:>8.1f} {scoped_ms:>10.1f} {full_kb:>8.0f} {scoped_kb:>10.0f} "
+                f"{'ok' if parity else 'FAIL':>7}"
+            )
+            failed = failed or not parity
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
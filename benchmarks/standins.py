@@ -0,0 +1,483 @@
+"""Local HTTP stand-ins for the services StackerBot talks to.
+
+Each service runs on its own port on 127.0.0.1 and counts the requests it
+serves, so a benchmark can point config at them (see benchmarks/e2e.py) and
+measure calls per post without touching the real APIs.
+
+- SubstackStandIn: RSS feed, archive API, post pages (with ETags) and VTT
+  captions for a synthetic publication.
+- YouTubeStandIn: the channel's Atom feed.
+- TranscriptStandIn: transcriptapi.com's transcript endpoint.
+- NotionStandIn: an in-memory database with cursor pagination, filters,
+  filter_properties, the 100-block and 500 KB limits per request and a request rate
+  cap answered with 429 + Retry-After.
+
+Every response is delayed by the service's latency (jittered +/-50%).
+"""
+
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+from benchmarks.pages import WORDS, make_post_html
+
+MAX_BLOCKS_PER_REQUEST = 100
+MAX_BODY_BYTES = 500 * 1024
+
+
+class World:
+    """The synthetic publication, its YouTube channel and transcripts.
+
+    Posts are kept newest first. A third embed their YouTube video, a third
+    only have a same-titled video on the channel, and every fifth of the
+    rest carries a native Substack video with VTT captions.
+    """
+
+    def __init__(self, posts=40, seed=0, sections=8, hydration_kb=200, transcript_kb=20):
+        self.rng = random.Random(seed)
+        self.sections = sections
+        self.hydration_kb = hydration_kb
+        self.transcript_kb = transcript_kb
+        self.posts = []
+        self.videos = []
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.publish(posts)
+
+    def publish(self, count):
+        """Adds count new posts on top of the archive."""
+        with self._lock:
+            for _ in range(count):
+                post_id = self._next_id
+                self._next_id += 1
+                title = f"{' '.join(self.rng.choice(WORDS) for _ in range(6)).capitalize()} {post_id}"
+                post = {
+                    "id": post_id,
+                    "title": title,
+                    "slug": f"post-{post_id}",
+                    "date": self._start + timedelta(days=post_id),
+                    "video_id": None,
+                    "vtt": False,
+                }
+                kind = post_id % 3
+                video_id = f"vid{post_id:08d}"
+                if kind == 0:
+                    post["video_id"] = video_id
+                if kind in (0, 1):
+                    self.videos.insert(0, (title, video_id))
+                elif post_id % 5 == 0:
+                    post["vtt"] = True
+                self.posts.insert(0, post)
+
+    def post(self, slug):
+        with self._lock:
+            return next((p for p in self.posts if p["slug"] == slug), None)
+
+    def transcript(self, key):
+        rng = random.Random(key)
+        words = []
+        size = 0
+        while size < self.transcript_kb * 1024:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+    name = "service"
+
+    def __init__(self, world, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.world = world
+        self.latency = latency
+        self.counts = Counter()
+        self._counts_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count(self, key, n=1):
+        with self._counts_lock:
+            self.counts[key] += n
+
+    def reset_counts(self):
+        with self._counts_lock:
+            self.counts.clear()
+
+    def handle_error(self, request, client_address):
+        # Clients that stop reading early (head-only cover lookups) hang up.
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    def handle(self, method, path, query, headers, body):
+        """Returns (status, headers, body)."""
+        raise NotImplementedError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _serve(self, method):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        split = urlsplit(self.path)
+        query = {k: v if len(v) > 1 else v[0] for k, v in parse_qs(split.query).items()}
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        status, headers, payload = server.handle(method, split.path, query, self.headers, body)
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload)
+            headers = {"Content-Type": "application/json", **headers}
+        if isinstance(payload, str):
+            payload = payload.encode()
+
+        server.count("requests")
+        server.count(f"status_{status}")
+        server.count("bytes", len(payload))
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._serve("GET")
+
+    def do_POST(self):
+        self._serve("POST")
+
+    def do_PATCH(self):
+        self._serve("PATCH")
+
+
+# --- Substack ---
+
+
+class SubstackStandIn(StandIn):
+    name = "substack"
+    rss_size = 20
+
+    def handle(self, method, path, query, headers, body):
+        world = self.world
+        if path == "/feed":
+            return 200, {"Content-Type": "application/rss+xml"}, self._rss(world.posts[: self.rss_size])
+        if path == "/api/v1/archive":
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 12))
+            return 200, {}, [self._archive_item(p) for p in world.posts[offset : offset + limit]]
+        if path.startswith("/p/"):
+            post = world.post(path[len("/p/"):])
+            if not post:
+                return 404, {}, "Not found"
+            etag = f'"{post["slug"]}"'
+            if headers.get("If-None-Match") == etag:
+                return 304, {"ETag": etag}, b""
+            return 200, {"Content-Type": "text/html; charset=utf-8", "ETag": etag}, self._page(post)
+        match = re.fullmatch(r"/vtt/(\w+)\.vtt", path)
+        if match:
+            return 200, {"Content-Type": "text/vtt"}, _vtt(world.transcript(match.group(1)))
+        return 404, {}, "Not found"
+
+    def post_url(self, post):
+        return f"{self.url}/p/{post['slug']}"
+
+    def _archive_item(self, post):
+        return {
+            "id": post["id"],
+            "title": post["title"],
+            "slug": post["slug"],
+            "canonical_url": self.post_url(post),
+            "post_date": post["date"].isoformat().replace("+00:00", "Z"),
+        }
+
+    def _rss(self, posts):
+        items = "".join(
+            f"<item><title>{escape(p['title'])}</title><link>{self.post_url(p)}</link>"
+            f"<guid>{self.post_url(p)}</guid><pubDate>{format_datetime(p['date'])}</pubDate></item>"
+            for p in posts
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Bench</title>{items}</channel></rss>'
+
+    def _page(self, post):
+        world = self.world
+        return make_post_html(
+            seed=post["id"],
+            sections=world.sections,
+            hydration_kb=world.hydration_kb,
+            title=post["title"],
+            video_id=post["video_id"],
+            vtt_url=f"{self.url}/vtt/{post['slug'].replace('-', '')}.vtt" if post["vtt"] else None,
+        )
+
+
+def _vtt(text):
+    words = text.split()
+    cues = ["WEBVTT", ""]
+    for i in range(0, len(words), 12):
+        start = i // 12 * 4
+        cues.append(str(i // 12 + 1))
+        cues.append(f"{_ts(start)} --> {_ts(start + 4)}")
+        cues.append(" ".join(words[i : i + 12]))
+        cues.append("")
+    return "\n".join(cues)
+
+
+def _ts(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.000"
+
+
+# --- YouTube ---
+
+
+class YouTubeStandIn(StandIn):
+    name = "youtube"
+    feed_size = 15
+
+    def handle(self, method, path, query, headers, body):
+        if path != "/feeds/videos.xml":
+            return 404, {}, "Not found"
+        entries = "".join(
+            f'<entry><title>{escape(title)}</title><link rel="alternate" href="https://www.youtube.com/watch?v={vid}"/></entry>'
+            for title, vid in self.world.videos[: self.feed_size]
+        )
+        return 200, {"Content-Type": "application/atom+xml"}, f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'
+
+
+class TranscriptStandIn(StandIn):
+    name = "transcript"
+
+    def handle(self, method, path, query, headers, body):
+        match = re.search(r"v=([\w-]+)", query.get("video_url", ""))
+        if not match:
+            return 404, {}, {"detail": "not found"}
+        text = self.world.transcript(match.group(1)).split()
+        return 200, {}, {"transcript": [{"text": " ".join(text[i : i + 12])} for i in range(0, len(text), 12)]}
+
+
+# --- Notion ---
+
+
+class NotionStandIn(StandIn):
+    """A single Notion database with the schema StackerBot writes."""
+
+    name = "notion"
+    SCHEMA = {
+        "Name": {"id": "title", "type": "title"},
+        "URL": {"id": "u%3Bl", "type": "url"},
+        "YouTube URL": {"id": "y%3Bt", "type": "url"},
+        "Date": {"id": "d%3Bt", "type": "date"},
+        "Type": {"id": "t%3Bp", "type": "select"},
+        "Content Status": {"id": "c%3Bs", "type": "select"},
+        "Source": {"id": "s%3Bc", "type": "select"},
+    }
+
+    def __init__(self, world, latency=0.0, requests_per_second=3.0, burst=None):
+        super().__init__(world, latency)
+        self.pages = {}
+        self.rate = requests_per_second
+        self.capacity = burst or max(1.0, requests_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        """Seconds the caller must wait, or 0 if the request may proceed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def handle(self, method, path, query, headers, body):
+        wait = self._admit()
+        if wait:
+            self.count("throttled")
+            return 429, {"Retry-After": str(math.ceil(wait))}, {"object": "error", "code": "rate_limited"}
+
+        if len(body) > MAX_BODY_BYTES:
+            return 400, {}, {"object": "error", "code": "validation_error", "message": "Request body too large."}
+        data = json.loads(body) if body else {}
+        parts = path.strip("/").split("/")[1:]  # drop the "v1" prefix
+        if method == "GET" and parts[:1] == ["databases"] and len(parts) == 2:
+            return 200, {}, {"object": "database", "id": parts[1], "properties": self.SCHEMA}
+        if method == "POST" and parts[:1] == ["databases"] and parts[2:] == ["query"]:
+            return self._query(data, query.get("filter_properties"))
+        if method == "POST" and parts == ["pages"]:
+            return self._create(data)
+        if method == "PATCH" and parts[:1] == ["pages"] and len(parts) == 2:
+            return self._update(parts[1], data)
+        if method == "PATCH" and parts[:1] == ["blocks"] and parts[2:] == ["children"]:
+            return self._append(parts[1], data.get("children", []))
+        return 404, {}, {"object": "error", "code": "object_not_found"}
+
+    def _now(self):
+        # Notion reports edit times rounded down to the minute.
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:00.000Z")
+
+    def _too_many(self, children):
+        if len(children) > MAX_BLOCKS_PER_REQUEST:
+            return 400, {}, {
+                "object": "error",
+                "code": "validation_error",
+                "message": f"body.children.length should be ≤ `{MAX_BLOCKS_PER_REQUEST}`, instead was `{len(children)}`.",
+            }
+        return None
+
+    def _create(self, data):
+        error = self._too_many(data.get("children", []))
+        if error:
+            return error
+        page_id = str(uuid.uuid4())
+        page = {
+            "object": "page",
+            "id": page_id,
+            "created_time": self._now(),
+            "last_edited_time": self._now(),
+            "cover": data.get("cover"),
+            "properties": {},
+            "blocks": len(data.get("children", [])),
+        }
+        self._set_properties(page, data.get("properties", {}))
+        with self._lock:
+            self.pages[page_id] = page
+        return 200, {}, self._public(page)
+
+    def _update(self, page_id, data):
+        with self._lock:
+            page = self.pages.get(page_id)
+            if not page:
+                return 404, {}, {"object": "error", "code": "object_not_found"}
+            if "cover" in data:
+                page["cover"] = data["cover"]
+            self._set_properties(page, data.get("properties", {}))
+            page["last_edited_time"] = self._now()
+            return 200, {}, self._public(page)
+
+    def _append(self, page_id, children):
+        error = self._too_many(children)
+        if error:
+            return error
+        with self._lock:
+            page = self.pages.get(page_id)
+            if not page:
+                return 404, {}, {"object": "error", "code": "object_not_found"}
+            page["blocks"] += len(children)
+            page["last_edited_time"] = self._now()
+        self.count("blocks", len(children))
+        return 200, {}, {"object": "list", "results": []}
+
+    def _set_properties(self, page, props):
+        for name, value in props.items():
+            schema = self.SCHEMA.get(name)
+            if not schema:
+                continue
+            kind = schema["type"]
+            if kind == "title":
+                text = "".join(part.get("text", {}).get("content", "") for part in value.get("title", []))
+                stored = [{"type": "text", "plain_text": text, "text": {"content": text}}]
+            else:
+                stored = value.get(kind)
+            page["properties"][name] = {"id": schema["id"], "type": kind, kind: stored}
+
+    def _public(self, page, filter_properties=None):
+        public = {k: v for k, v in page.items() if k != "blocks"}
+        if filter_properties is not None:
+            if isinstance(filter_properties, str):
+                filter_properties = [filter_properties]
+            public["properties"] = {
+                name: prop for name, prop in page["properties"].items() if prop["id"] in filter_properties
+            }
+        return public
+
+    def _query(self, data, filter_properties):
+        with self._lock:
+            pages = [p for p in self.pages.values() if _matches(p, data.get("filter"))]
+        pages.sort(key=lambda p: (p["last_edited_time"], p["created_time"], p["id"]))
+        if any(s.get("direction") == "descending" for s in data.get("sorts", [])):
+            pages.reverse()
+
+        start = int(data.get("start_cursor") or 0)
+        size = min(int(data.get("page_size") or 100), 100)
+        batch = pages[start : start + size]
+        has_more = start + size < len(pages)
+        return 200, {}, {
+            "object": "list",
+            "results": [self._public(p, filter_properties) for p in batch],
+            "has_more": has_more,
+            "next_cursor": str(start + size) if has_more else None,
+        }
+
+    # Helpers for benchmark scenarios
+
+    def strip_covers(self, every=3):
+        """Removes the cover of every `every`-th page, as if never set."""
+        with self._lock:
+            for i, page in enumerate(sorted(self.pages.values(), key=lambda p: p["created_time"])):
+                if i % every == 0:
+                    page["cover"] = None
+                    page["last_edited_time"] = self._now()
+
+
+def _matches(page, condition):
+    if not condition:
+        return True
+    if "or" in condition:
+        return any(_matches(page, c) for c in condition["or"])
+    if "and" in condition:
+        return all(_matches(page, c) for c in condition["and"])
+    if condition.get("timestamp") == "last_edited_time":
+        bound = condition["last_edited_time"].get("on_or_after")
+        return bound is None or page["last_edited_time"] >= bound
+
+    prop = page["properties"].get(condition.get("property"), {})
+    kind = prop.get("type")
+    if kind == "title":
+        text = "".join(part.get("plain_text", "") for part in prop.get("title", []))
+        wanted = condition.get("title", {})
+        if "contains" in wanted:
+            return wanted["contains"].lower() in text.lower()
+        if "equals" in wanted:
+            return wanted["equals"] == text
+        return True
+    wanted = condition.get("url") or condition.get(kind) or {}
+    value = prop.get(kind) if prop else None
+    if wanted.get("is_empty"):
+        return not value
+    if wanted.get("is_not_empty"):
+        return bool(value)
+    if "equals" in wanted:
+        return value == wanted["equals"]
+    return True
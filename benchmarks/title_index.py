@@ -0,0 +1,112 @@
+"""Lookup cost of TitleIndex vs. the linear set scan as the database grows.
+
+Queries come in three kinds, timed separately: exact copies of an existing
+title (answered by the set lookup), near duplicates with a few characters
+inserted, deleted or changed, and new titles that match nothing. Misses
+are the common case in a sync and the one that has to check the most.
+
+Usage: python -m benchmarks.title_index [--sizes 1000 10000 100000] [--lookups 200]
+"""
+
+import argparse
+import random
+import time
+
+from scraper.title_index import TitleIndex
+from scraper.utils import is_duplicate, normalize_title
+
+SYLLABLES = [
+    "ai", "ag", "al", "an", "ar", "ba", "be", "bi", "bo", "ca", "ce", "co", "da", "de", "di", "do",
+    "el", "en", "er", "fa", "fi", "fo", "ga", "ge", "go", "ha", "he", "in", "is", "ka", "la", "le",
+    "li", "lo", "ma", "me", "mi", "mo", "na", "ne", "no", "or", "pa", "pe", "po", "ra", "re", "ri",
+    "ro", "sa", "se", "si", "so", "ta", "te", "ti", "to", "un", "va", "ve", "vi", "wa", "we", "yo",
+]
+COMMON = ["the", "of", "for", "your", "and", "how", "why", "what", "is", "to", "in", "ai"]
+
+
+def make_vocabulary(rng, size=20000):
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def make_title(rng, vocabulary, weights):
+    # Headline-like: a handful of content words drawn with Zipf frequencies
+    # (so some words recur a lot) padded with stop words.
+    words = []
+    for _ in range(rng.randint(4, 9)):
+        if rng.random() < 0.3:
+            words.append(rng.choice(COMMON))
+        else:
+            words.append(rng.choices(vocabulary, cum_weights=weights)[0])
+    return " ".join(words).title()
+
+
+def zipf_weights(size):
+    total, weights = 0.0, []
+    for rank in range(1, size + 1):
+        total += 1.0 / rank
+        weights.append(total)
+    return weights
+
+
+def make_near_duplicate(rng, title):
+    chars = list(title)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        edit = rng.random()
+        if edit < 0.4:
+            del chars[i]
+        elif edit < 0.8:
+            chars.insert(i, rng.choice("aeiost"))
+        else:
+            chars[i] = rng.choice("xyz")
+    return "".join(chars)
+
+
+def time_lookups(check, queries):
+    start = time.perf_counter()
+    hits = sum(1 for q in queries if check(q))
+    return (time.perf_counter() - start) / len(queries) * 1e6, hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--linear-max", type=int, default=10000, help="skip the linear scan above this size")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+    weights = zipf_weights(len(vocabulary))
+    kinds = ("exact", "near", "miss")
+    columns = " ".join(f"{kind + ' us':>10} {'linear':>8} {'hits':>5}" for kind in kinds)
+    print(f"{'titles':>8} {'build s':>8} {columns}")
+    for size in args.sizes:
+        titles = [make_title(rng, vocabulary, weights) for _ in range(size)]
+        norms = {normalize_title(t) for t in titles}
+        queries = {
+            "exact": [rng.choice(titles) for _ in range(args.lookups)],
+            "near": [make_near_duplicate(rng, rng.choice(titles)) for _ in range(args.lookups)],
+            "miss": [],
+        }
+        while len(queries["miss"]) < args.lookups:
+            title = make_title(rng, vocabulary, weights)
+            if normalize_title(title) not in norms:
+                queries["miss"].append(title)
+
+        start = time.perf_counter()
+        index = TitleIndex(norms)
+        build = time.perf_counter() - start
+
+        row = f"{size:>8} {build:>8.2f}"
+        for kind in kinds:
+            index_us, hits = time_lookups(lambda q: is_duplicate(q, index), queries[kind])
+            linear = "skipped"
+            if size <= args.linear_max:
+                linear_us, _ = time_lookups(lambda q: is_duplicate(q, norms), queries[kind][:20])
+                linear = f"{linear_us:.0f}"
+            row += f" {index_us:>10.0f} {linear:>8} {hits:>5}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import logging
 import sys
+import time
 from datetime import datetime
 
 from scraper.config import validate
@@ -11,8 +12,29 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
+USAGE = "Usage: python main.py [sync|fix-covers|repair-youtube|backfill [--new-only] [--resume]]"
+
+# Flags each task accepts; --some-flag becomes run(some_flag=True).
+TASK_FLAGS = {
+    "sync": (),
+    "fix-covers": (),
+    "repair-youtube": (),
+    "backfill": ("--new-only", "--resume"),
+}
+
+
 def main():
     task = sys.argv[1] if len(sys.argv) > 1 else "sync"
+    if task not in TASK_FLAGS:
+        print(f"Unknown task: {task}")
+        print(USAGE)
+        sys.exit(1)
+    unknown = [arg for arg in sys.argv[2:] if arg not in TASK_FLAGS[task]]
+    if unknown:
+        print(f"Unknown option for {task}: {' '.join(unknown)}")
+        print(USAGE)
+        sys.exit(1)
+    options = {arg.lstrip("-").replace("-", "_"): True for arg in sys.argv[2:]}
 
     validate()
     log.info(f"Starting task: {task} at {datetime.now()}")
@@ -23,14 +45,18 @@ def main():
         from tasks.fix_covers import run
     elif task == "repair-youtube":
         from tasks.repair_youtube import run
-    elif task == "backfill":
-        from tasks.backfill import run
     else:
-        print(f"Unknown task: {task}")
-        print("Usage: python main.py [sync|fix-covers|repair-youtube|backfill]")
-        sys.exit(1)
+        from tasks.backfill import run
+
+    from scraper import metrics
 
-    run()
+    start = time.perf_counter()
+    ok = False
+    try:
+        run(**options)
+        ok = True
+    finally:
+        metrics.write_run_summary(task, time.perf_counter() - start, ok)
     log.info("Task complete.")
 
 
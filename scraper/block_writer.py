@@ -0,0 +1,135 @@
+"""Packs a page's blocks into as few Notion requests as the limits allow.
+
+Notion takes at most 100 blocks per request (nested ones included) and
+rejects bodies over 500 KB. Batches are filled greedily up to both limits,
+the first one riding along with the page create call. A batch that fails
+is retried a few times on its own; one that is rejected as too large is
+split in half. The writer stops at the first batch it cannot write, so
+`written` always counts a prefix of the blocks that is on the page.
+"""
+
+import json
+import logging
+import time
+
+from scraper import metrics
+from scraper.notion_async import get_client, run_sync
+
+log = logging.getLogger(__name__)
+
+MAX_BLOCKS = 100
+# Notion's limit is 500 KB for the whole body; keep room for the envelope.
+MAX_PAYLOAD_BYTES = 480 * 1024
+ATTEMPTS = 3
+RETRY_STATUSES = {409, 429, 500, 502, 503, 504}
+
+
+def _size(obj):
+    return len(json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+def _block_count(block):
+    nested = block.get(block.get("type"), {})
+    children = nested.get("children", []) if isinstance(nested, dict) else []
+    return 1 + sum(_block_count(child) for child in children)
+
+
+def next_batch(blocks, start, reserved_bytes=0, max_blocks=MAX_BLOCKS):
+    """End index of the largest batch from blocks[start:] that fits one request."""
+    count = 0
+    size = reserved_bytes
+    end = start
+    while end < len(blocks):
+        block_count = _block_count(blocks[end])
+        block_size = _size(blocks[end]) + 1
+        if end > start and (count + block_count > max_blocks or size + block_size > MAX_PAYLOAD_BYTES):
+            break
+        count += block_count
+        size += block_size
+        end += 1
+    return end
+
+
+class BlockWriter:
+    """Writes `children` to a page, starting from block `written`.
+
+    on_batch(written) is called after every batch that lands, so callers
+    can checkpoint progress (the backfill journal does).
+    """
+
+    def __init__(self, children, written=0, on_batch=None):
+        self.children = children
+        self.written = written
+        self.on_batch = on_batch
+        self.requests = 0
+        self._too_large = False
+        # Lowered for the rest of the page when Notion rejects a batch as too large.
+        self._max_blocks = MAX_BLOCKS
+
+    @property
+    def complete(self):
+        return self.written >= len(self.children)
+
+    def create(self, payload):
+        """Creates the page from payload plus the first batch of children.
+
+        Returns the new page id, or None if the create call failed.
+        """
+        reserved = _size(payload)
+        while True:
+            end = next_batch(self.children, self.written, reserved_bytes=reserved, max_blocks=self._max_blocks)
+            body = {**payload, "children": self.children[self.written : end]}
+            response = self._send(lambda: get_client().create_page(body))
+            if response is not None:
+                break
+            # A rejected body created nothing, so a smaller one is safe to try.
+            if not self._too_large or end - self.written <= 1:
+                return None
+            self._max_blocks = max(1, (end - self.written) // 2)
+        self._advance(end)
+        return response.json()["id"]
+
+    def append(self, page_id):
+        """Appends the remaining children; returns True once all are on the page."""
+        while not self.complete:
+            end = next_batch(self.children, self.written, max_blocks=self._max_blocks)
+            batch = self.children[self.written : end]
+            response = self._send(lambda: get_client().append_children(page_id, batch), retry=True)
+            if response is None:
+                if self._too_large and len(batch) > 1:
+                    self._max_blocks = max(1, len(batch) // 2)
+                    continue
+                log.error(f"Stopped after {self.written} of {len(self.children)} blocks on page {page_id}")
+                metrics.incr("pages_partial")
+                return False
+            self._advance(end)
+        return True
+
+    def _advance(self, end):
+        self.written = end
+        if self.on_batch:
+            self.on_batch(end)
+
+    def _send(self, make_request, retry=False):
+        """Runs a request; returns the response, or None once it has failed
+        for good. Only appends are retried here: repeating a create that may
+        have gone through would duplicate the page."""
+        self._too_large = False
+        for attempt in range(ATTEMPTS if retry else 1):
+            if attempt:
+                time.sleep(2**attempt)
+            self.requests += 1
+            try:
+                response = run_sync(make_request())
+            except Exception as e:
+                log.error(f"Network error writing blocks: {e}")
+                continue
+            if response.status_code == 200:
+                return response
+            log.error(f"Notion write error: {response.status_code} {response.text[:300]}")
+            if response.status_code == 413 or (response.status_code == 400 and "too large" in response.text.lower()):
+                self._too_large = True
+                return None
+            if response.status_code not in RETRY_STATUSES:
+                return None
+        return None
@@ -14,6 +14,59 @@ SUBSTACK_COOKIE = os.environ.get("SUBSTACK_COOKIE", "")
 TRANSCRIPT_API_KEY = os.environ.get("TRANSCRIPT_API_KEY", "")
 YOUTUBE_CHANNEL_ID = os.environ.get("YOUTUBE_CHANNEL_ID", "")
 
+# Per-run metrics: JSON summaries, and optionally Prometheus textfiles for
+# node_exporter's textfile collector (set empty to disable)
+METRICS_DIR = os.environ.get("METRICS_DIR", ".stackerbot/metrics")
+METRICS_TEXTFILE_DIR = os.environ.get("METRICS_TEXTFILE_DIR", "")
+
+# Service endpoints (only overridden to point at local stand-ins, see benchmarks/e2e.py)
+NOTION_API_URL = os.environ.get("NOTION_API_URL", "https://api.notion.com/v1/")
+YOUTUBE_FEED_URL = os.environ.get("YOUTUBE_FEED_URL", "https://www.youtube.com/feeds/videos.xml")
+TRANSCRIPT_API_URL = os.environ.get("TRANSCRIPT_API_URL", "https://transcriptapi.com/api/v2/youtube/transcript")
+
+# Local state
+STATE_DB_PATH = os.environ.get("STATE_DB_PATH", ".stackerbot/state.db")
+STATE_FULL_REFRESH_DAYS = int(os.environ.get("STATE_FULL_REFRESH_DAYS", "7"))
+# Pages whose cover lookup failed are retried after 6h, 12h, 24h, ... (capped)
+COVER_RETRY_HOURS = float(os.environ.get("COVER_RETRY_HOURS", "6"))
+COVER_RETRY_MAX_DAYS = float(os.environ.get("COVER_RETRY_MAX_DAYS", "30"))
+COVER_WORKERS = int(os.environ.get("COVER_WORKERS", "8"))
+# Pages where repair_youtube found no video are looked at again after 24h, 48h, ... (capped)
+VIDEO_RECHECK_HOURS = float(os.environ.get("VIDEO_RECHECK_HOURS", "24"))
+VIDEO_RECHECK_MAX_DAYS = float(os.environ.get("VIDEO_RECHECK_MAX_DAYS", "60"))
+
+# Transcript layout in Notion: "dense" packs each block with up to 100 text
+# segments of 2000 chars; "paragraphs" is one block per 1900 chars. With
+# TRANSCRIPT_SECTION_MINUTES, API transcripts start a new block every N minutes.
+TRANSCRIPT_LAYOUT = os.environ.get("TRANSCRIPT_LAYOUT", "dense")
+TRANSCRIPT_SECTION_MINUTES = float(os.environ.get("TRANSCRIPT_SECTION_MINUTES", "0"))
+
+# Transcripts already fetched (and recent "no transcript" answers)
+TRANSCRIPT_CACHE_PATH = os.environ.get("TRANSCRIPT_CACHE_PATH", ".stackerbot/transcripts.db")
+TRANSCRIPT_CACHE_MAX_MB = int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "200"))
+TRANSCRIPT_NEGATIVE_TTL_HOURS = float(os.environ.get("TRANSCRIPT_NEGATIVE_TTL_HOURS", "24"))
+
+# HTTP cache for feeds and post pages
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".stackerbot/http")
+HTTP_CACHE_MAX_MB = int(os.environ.get("HTTP_CACHE_MAX_MB", "100"))
+HTTP_CACHE_MAX_AGE_DAYS = int(os.environ.get("HTTP_CACHE_MAX_AGE_DAYS", "14"))
+
+# Channel videos seen on earlier runs (the feed only lists the latest ones)
+YOUTUBE_CATALOG_PATH = os.environ.get("YOUTUBE_CATALOG_PATH", ".stackerbot/youtube_catalog.json")
+
+# HTML parser for post pages: "auto" (lxml if installed), "lxml" or "html.parser"
+HTML_PARSER = os.environ.get("HTML_PARSER", "auto")
+
+# While the local store is cold, the daily sync checks up to this many posts
+# against Notion directly instead of walking the whole database
+LOOKUP_MAX_POSTS = int(os.environ.get("LOOKUP_MAX_POSTS", "50"))
+
+# Throughput
+SYNC_WORKERS = int(os.environ.get("SYNC_WORKERS", "4"))
+ARCHIVE_PREFETCH = int(os.environ.get("ARCHIVE_PREFETCH", "3"))
+ARCHIVE_STOP_AFTER_KNOWN = int(os.environ.get("ARCHIVE_STOP_AFTER_KNOWN", "10"))
+NOTION_REQUESTS_PER_SECOND = float(os.environ.get("NOTION_REQUESTS_PER_SECOND", "3"))
+
 BROWSER_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
 }
@@ -1,159 +1,231 @@
-from bs4 import NavigableString, Tag
-
-from scraper.utils import get_video_id_from_url
-
-
-def parse_rich_text(tag):
-    rich_text = []
-    if isinstance(tag, NavigableString):
-        if str(tag).strip():
-            return [{"type": "text", "text": {"content": str(tag)[:2000]}}]
-        return []
-
-    for child in tag.children:
-        if isinstance(child, NavigableString):
-            text_content = str(child)
-            if text_content:
-                rich_text.append({"type": "text", "text": {"content": text_content[:2000]}})
-        elif isinstance(child, Tag):
-            text_content = child.get_text()
-            if not text_content:
+import logging
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+from scraper import config
+from scraper.utils import SEGMENTS_PER_BLOCK, get_video_id_from_url, split_text
+
+log = logging.getLogger(__name__)
+
+# Tree builders html_to_notion_blocks can run on, fastest first. lxml is a
+# C parser; html.parser ships with Python and is the fallback.
+BACKENDS = ("lxml", "html.parser")
+
+_backend = None
+
+
+def _available(backend):
+    if backend == "html.parser":
+        return True
+    try:
+        __import__(backend)
+    except ImportError:
+        return False
+    return True
+
+
+def get_backend():
+    """The parser named by HTML_PARSER, or the fastest installed one."""
+    global _backend
+    if _backend is None:
+        wanted = config.HTML_PARSER
+        if wanted != "auto" and not _available(wanted):
+            log.warning(f"HTML parser '{wanted}' is not installed, falling back.")
+            wanted = "auto"
+        if wanted == "auto":
+            wanted = next(b for b in BACKENDS if _available(b))
+        _backend = wanted
+    return _backend
+
+
+def make_soup(html, backend=None, parse_only=None):
+    return BeautifulSoup(html, backend or get_backend(), parse_only=parse_only)
+
+
+# Inline tags and the annotation each one turns on for the text inside it.
+ANNOTATIONS = {
+    "b": "bold",
+    "strong": "bold",
+    "i": "italic",
+    "em": "italic",
+    "s": "strikethrough",
+    "strike": "strikethrough",
+    "del": "strikethrough",
+    "u": "underline",
+    "code": "code",
+}
+HEADINGS = {"h1": "heading_2", "h2": "heading_2", "h3": "heading_3"}
+# Only these string types are page text; comments, scripts and styles are not.
+TEXT_TYPES = (NavigableString, CData)
+
+
+class _Scan:
+    """What one walk over an element's subtree found: text runs as
+    (text, annotations, link), and the first <img> and <a> inside it."""
+
+    __slots__ = ("runs", "image", "link")
+
+    def __init__(self):
+        self.runs = []
+        self.image = None
+        self.link = None
+
+    @property
+    def text(self):
+        return "".join(run[0] for run in self.runs)
+
+
+def rich_text(runs):
+    """Notion rich_text for text runs. Neighbouring runs with the same
+    formatting are merged and long ones split at Notion's segment limit."""
+    merged = []
+    for text, marks, href in runs:
+        if merged and merged[-1][1] == marks and merged[-1][2] == href:
+            merged[-1][0].append(text)
+        else:
+            merged.append(([text], marks, href))
+
+    segments = []
+    for parts, marks, href in merged:
+        for chunk in split_text("".join(parts)):
+            segment = {"type": "text", "text": {"content": chunk}}
+            if href:
+                segment["text"]["link"] = {"url": href}
+            if marks:
+                segment["annotations"] = {mark: True for mark in sorted(marks)}
+            segments.append(segment)
+    return segments
+
+
+class _Compiler:
+    """Turns post content into Notion blocks, visiting every node once.
+
+    The container walk descends through divs (and links wrapping images)
+    to block-level elements; each of those is scanned once for its text,
+    formatting, first image and first link, and the block is built from
+    that scan.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.youtube_id = None
+
+    def container(self, container):
+        for element in container.children:
+            if not isinstance(element, Tag):
                 continue
-            annotations = {
-                "bold": child.name in ["b", "strong"],
-                "italic": child.name in ["i", "em"],
-                "strikethrough": child.name in ["s", "strike", "del"],
-                "underline": child.name in ["u"],
-                "code": child.name in ["code"],
-            }
-            text_obj = {
-                "type": "text",
-                "text": {"content": text_content[:2000]},
-                "annotations": annotations,
-            }
-            if child.name == "a" and child.get("href"):
-                text_obj["text"]["link"] = {"url": child["href"]}
-            if child.find("a"):
-                link = child.find("a")
-                if link and link.get("href"):
-                    text_obj["text"]["link"] = {"url": link["href"]}
-            rich_text.append(text_obj)
-
-    if not rich_text and tag.get_text().strip():
-        return [{"type": "text", "text": {"content": tag.get_text()[:2000]}}]
-    return rich_text
-
-
-def process_element_to_block(element):
-    # Code blocks
-    if element.name == "pre":
-        code_text = element.get_text()[:2000]
-        return {
-            "object": "block",
-            "type": "code",
-            "code": {
-                "rich_text": [{"type": "text", "text": {"content": code_text}}],
-                "language": "plain text",
-            },
-        }
-
-    # Headings
-    if element.name in ["h1", "h2", "h3"]:
-        level = "heading_2" if element.name in ["h1", "h2"] else "heading_3"
-        rt = parse_rich_text(element)
-        if rt:
-            return {"object": "block", "type": level, level: {"rich_text": rt}}
-
-    # List items
-    if element.name == "li":
-        rt = parse_rich_text(element)
-        if rt:
+            name = element.name
+            if name == "iframe":
+                self._iframe(element)
+            elif name == "a":
+                self._link(element)
+
+            if name == "div" or (name == "a" and element.find("img")):
+                self.container(element)
+            elif name in ("ul", "ol"):
+                self._list(element)
+            elif name != "a":
+                block = self.block(element)
+                if block:
+                    self._add(block)
+
+    def _list(self, element):
+        for li in element.children:
+            if not isinstance(li, Tag) or li.name != "li":
+                continue
+            block = self.block(li)
+            if block and element.name == "ol" and block["type"] == "bulleted_list_item":
+                block["type"] = "numbered_list_item"
+                block["numbered_list_item"] = block.pop("bulleted_list_item")
+            if block:
+                self._add(block)
+
+    def _add(self, block):
+        """Appends block; text past Notion's SEGMENTS_PER_BLOCK rich_text
+        segments continues in further blocks of the same type."""
+        kind = block["type"]
+        body = block[kind]
+        text = body.get("rich_text")
+        if not text or len(text) <= SEGMENTS_PER_BLOCK:
+            self.blocks.append(block)
+            return
+        for i in range(0, len(text), SEGMENTS_PER_BLOCK):
+            self.blocks.append({**block, kind: {**body, "rich_text": text[i : i + SEGMENTS_PER_BLOCK]}})
+
+    def block(self, element):
+        name = element.name
+        scan = _Scan()
+        self._scan(element, scan, frozenset(), None)
+        self._link(scan.link)
+
+        if name == "pre":
+            code = [{"type": "text", "text": {"content": chunk}} for chunk in split_text(scan.text)]
+            return _block("code", code or [{"type": "text", "text": {"content": ""}}], language="plain text")
+
+        text = rich_text(scan.runs)
+        if name in HEADINGS and text:
+            return _block(HEADINGS[name], text)
+        if name == "li" and text:
+            return _block("bulleted_list_item", text)
+        if name == "blockquote" and text:
+            return _block("quote", text)
+
+        image = element if name == "img" else scan.image
+        if image is not None and str(image.get("src", "")).startswith("http"):
             return {
                 "object": "block",
-                "type": "bulleted_list_item",
-                "bulleted_list_item": {"rich_text": rt},
+                "type": "image",
+                "image": {"type": "external", "external": {"url": image["src"]}},
             }
 
-    if element.name == "ul":
+        if name == "p" and scan.text.strip():
+            return _block("paragraph", text)
         return None
 
-    # Blockquotes
-    if element.name == "blockquote":
-        rt = parse_rich_text(element)
-        if rt:
-            return {"object": "block", "type": "quote", "quote": {"rich_text": rt}}
-
-    # Images
-    if element.name in ("img", "figure") or element.find("img"):
-        img = element if element.name == "img" else element.find("img")
-        if img and img.get("src"):
-            src = img.get("src")
-            if src.startswith("http"):
-                return {
-                    "object": "block",
-                    "type": "image",
-                    "image": {"type": "external", "external": {"url": src}},
-                }
-
-    # Paragraphs
-    if element.name == "p":
-        text_content = element.get_text().strip()
-        if not text_content:
-            return None
-        if len(text_content) > 1900:
-            return {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [{"type": "text", "text": {"content": text_content[:1900]}}]
-                },
-            }
-        rt = parse_rich_text(element)
-        if rt:
-            return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": rt}}
-
-    return None
+    def _scan(self, element, scan, marks, href):
+        for child in element.children:
+            if type(child) in TEXT_TYPES:
+                if child:
+                    scan.runs.append((str(child), marks, href))
+                continue
+            if not isinstance(child, Tag):
+                continue
+            name = child.name
+            if name == "img":
+                if scan.image is None:
+                    scan.image = child
+                continue
+            if name == "iframe":
+                self._iframe(child)
+            child_href = href
+            if name == "a":
+                if scan.link is None:
+                    scan.link = child
+                child_href = child.get("href") or href
+            mark = ANNOTATIONS.get(name)
+            self._scan(child, scan, marks | {mark} if mark else marks, child_href)
 
+    def _iframe(self, iframe):
+        src = str(iframe.get("src", ""))
+        if "youtube" in src:
+            self.youtube_id = get_video_id_from_url(src) or self.youtube_id
 
-def html_to_notion_blocks(soup_content):
-    blocks = []
-    found_yt_id = None
-
-    def process_container(container):
-        nonlocal found_yt_id
-        for element in container.find_all(recursive=False):
-            # Detect embedded YouTube
-            if element.name == "iframe" and "youtube" in str(element.get("src", "")):
-                found_yt_id = get_video_id_from_url(element["src"])
-            if element.find("a") and "youtube.com/watch" in str(
-                element.find("a").get("href", "")
-            ):
-                found_yt_id = get_video_id_from_url(element.find("a")["href"])
-
-            # Recurse into divs
-            if element.name == "div":
-                process_container(element)
-                continue
+    def _link(self, link):
+        href = str(link.get("href", "")) if link is not None else ""
+        if "youtube.com/watch" in href:
+            self.youtube_id = get_video_id_from_url(href) or self.youtube_id
 
-            # Recurse into links wrapping images
-            if element.name == "a" and element.find("img"):
-                process_container(element)
-                continue
 
-            # Handle lists
-            if element.name in ["ul", "ol"]:
-                for li in element.find_all("li", recursive=False):
-                    b = process_element_to_block(li)
-                    if b:
-                        if element.name == "ol":
-                            b["type"] = "numbered_list_item"
-                            b["numbered_list_item"] = b.pop("bulleted_list_item")
-                        blocks.append(b)
-                continue
+def _block(kind, text, **extra):
+    return {"object": "block", "type": kind, kind: {"rich_text": text, **extra}}
 
-            block = process_element_to_block(element)
-            if block:
-                blocks.append(block)
 
-    process_container(soup_content)
-    return blocks, found_yt_id
+def html_to_notion_blocks(soup_content):
+    """(blocks, youtube_id) for a post's content element.
+
+    youtube_id is the last YouTube embed, or YouTube link that is the first
+    link of its block, in the content.
+    """
+    compiler = _Compiler()
+    compiler.container(soup_content)
+    return compiler.blocks, compiler.youtube_id
@@ -0,0 +1,159 @@
+"""On-disk conditional-GET cache for feeds and post pages.
+
+Stored responses keep their ETag / Last-Modified validators. The next fetch
+sends If-None-Match / If-Modified-Since and a 304 is answered from disk.
+Responses without validators are never stored. The cache is bounded by
+HTTP_CACHE_MAX_MB and HTTP_CACHE_MAX_AGE_DAYS, evicting least recently
+used entries first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from scraper import config, http_client
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+class CachedResponse:
+    """The parts of requests.Response the scrapers use, for a body from disk."""
+
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, url, content, headers, encoding):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _paths(url, cookie):
+    key = hashlib.sha256(f"{int(bool(cookie))}:{url}".encode()).hexdigest()
+    base = os.path.join(config.HTTP_CACHE_DIR, key)
+    return base + ".json", base + ".body"
+
+
+def _read(url, cookie):
+    meta_path, body_path = _paths(url, cookie)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _store(url, cookie, response, validators):
+    meta_path, body_path = _paths(url, cookie)
+    os.makedirs(config.HTTP_CACHE_DIR, exist_ok=True)
+    meta = {
+        "url": url,
+        "headers": {k.lower(): v for k, v in response.headers.items() if k.lower() in ("content-type", "etag", "last-modified")},
+        "encoding": response.encoding,
+        **validators,
+    }
+    with _lock:
+        _write_atomic(body_path, response.content)
+        _write_atomic(meta_path, json.dumps(meta).encode())
+        _evict()
+
+
+def _evict():
+    max_age = config.HTTP_CACHE_MAX_AGE_DAYS * 86400
+    max_bytes = config.HTTP_CACHE_MAX_MB * 1024 * 1024
+    now = time.time()
+
+    entries = []
+    for name in os.listdir(config.HTTP_CACHE_DIR):
+        if not name.endswith(".body"):
+            continue
+        path = os.path.join(config.HTTP_CACHE_DIR, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path[: -len(".body")]))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, base in entries:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        for suffix in (".body", ".json"):
+            try:
+                os.remove(base + suffix)
+            except OSError:
+                pass
+        total -= size
+
+
+def feed_headers(response):
+    """Response headers in the lower-cased form feedparser expects.
+
+    Includes the validators, so feed.etag / feed.modified reflect the cached
+    copy even when the body came from a 304.
+    """
+    return {k.lower(): v for k, v in response.headers.items()}
+
+
+def is_cached(url, cookie=False):
+    return os.path.exists(_paths(url, cookie)[0])
+
+
+def get(url, cookie=False, **kwargs):
+    """GET through the cache. Returns a requests.Response or a CachedResponse."""
+    meta, body = _read(url, cookie)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = http_client.get(url, cookie=cookie, headers=headers, **kwargs)
+
+    if response.status_code == 304 and meta:
+        # Touch the body so eviction treats it as recently used.
+        try:
+            os.utime(_paths(url, cookie)[1])
+        except OSError:
+            pass
+        log.info(f"Not modified, using cached copy: {url}")
+        return CachedResponse(url, body, meta["headers"], meta.get("encoding"))
+
+    if response.status_code == 200:
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["last_modified"] = response.headers["Last-Modified"]
+        if validators:
+            try:
+                _store(url, cookie, response, validators)
+            except OSError as e:
+                log.warning(f"Could not cache {url}: {e}")
+    return response
@@ -0,0 +1,144 @@
+"""Pooled HTTP sessions for Substack, YouTube and the transcript API.
+
+One requests.Session per host, so connections (and TLS sessions) are reused
+across posts and worker threads. Timeouts and retry policy are set per host,
+headers come from config once, and every request is counted per host in
+scraper.metrics.
+Notion traffic goes through notion_async instead.
+"""
+
+import codecs
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from scraper import config, metrics
+
+log = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {"timeout": 20, "retries": 3, "backoff": 1}
+
+HOST_POLICIES = {
+    "transcriptapi.com": {"timeout": 60, "retries": 3, "backoff": 2},
+    "www.youtube.com": {"timeout": 15, "retries": 2, "backoff": 1},
+}
+
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _host(url):
+    return urlsplit(url).hostname or ""
+
+
+def _policy(host):
+    return HOST_POLICIES.get(host, DEFAULT_POLICY)
+
+
+def _host_headers(host):
+    headers = dict(config.BROWSER_HEADERS)
+    if host == _host(config.TRANSCRIPT_API_URL) and config.TRANSCRIPT_API_KEY:
+        headers["Authorization"] = f"Bearer {config.TRANSCRIPT_API_KEY}"
+    return headers
+
+
+def _session(host):
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            policy = _policy(host)
+            retry = Retry(
+                total=policy["retries"],
+                backoff_factor=policy["backoff"],
+                status_forcelist=RETRY_STATUSES,
+                respect_retry_after_header=True,
+            )
+            pool_size = max(10, config.SYNC_WORKERS * 2, config.COVER_WORKERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(_host_headers(host))
+            _sessions[host] = session
+    return session
+
+
+def request(method, url, cookie=False, **kwargs):
+    """Sends a request on the pooled session for url's host.
+
+    cookie=True adds the Substack subscription cookie (only pass it for
+    Substack pages and assets). Raises requests exceptions like requests does.
+    """
+    host = _host(url)
+    kwargs.setdefault("timeout", _policy(host)["timeout"])
+    if cookie and config.SUBSTACK_COOKIE:
+        kwargs["headers"] = {**kwargs.get("headers", {}), "Cookie": config.SUBSTACK_COOKIE}
+
+    try:
+        response = _session(host).request(method, url, **kwargs)
+    except requests.RequestException:
+        metrics.count_http(host, requests=1, errors=1)
+        raise
+
+    retries = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+    metrics.count_http(
+        host,
+        requests=1,
+        # A streamed body is counted by whoever reads it.
+        bytes=0 if kwargs.get("stream") else len(response.content),
+        retries=len(retries),
+        throttled=sum(1 for r in retries if r.status == 429) + (response.status_code == 429),
+    )
+    return response
+
+
+def get(url, cookie=False, **kwargs):
+    return request("GET", url, cookie=cookie, **kwargs)
+
+
+def get_prefix(url, done, cookie=False, chunk_size=16384, **kwargs):
+    """GETs url but reads the body only until done(body_so_far) is true,
+    then closes the connection without downloading the rest.
+
+    Returns (response, body). Non-200 responses are returned with an empty
+    body.
+    """
+    response = request("GET", url, cookie=cookie, stream=True, **kwargs)
+    body = bytearray()
+    try:
+        if response.status_code == 200:
+            for chunk in response.iter_content(chunk_size):
+                body += chunk
+                if done(body):
+                    break
+    finally:
+        response.close()
+        metrics.count_http(_host(url), bytes=len(body))
+    return response, bytes(body)
+
+
+def iter_lines(response, chunk_size=16384, encoding="utf-8"):
+    """Decoded lines of a response made with stream=True, read as they
+    arrive. Only one chunk is held at a time. Counts the bytes it reads
+    and closes the response when done."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    read = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            read += len(chunk)
+            lines = (pending + decoder.decode(chunk)).split("\n")
+            pending = lines.pop()
+            yield from lines
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+    finally:
+        response.close()
+        metrics.count_http(_host(response.url), bytes=read)
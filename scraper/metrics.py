@@ -0,0 +1,184 @@
+"""Per-run metrics: wall time per stage, HTTP traffic per host, counters.
+
+Everything is process-global and thread-safe, and covers one task run.
+`write_run_summary()` writes it out when the task finishes:
+- a JSON summary into METRICS_DIR
+- optionally a Prometheus textfile into METRICS_TEXTFILE_DIR, for
+  node_exporter's textfile collector
+
+Stages are recorded with `stage()` (a context manager) or `timed()` (a
+decorator). Nested stages each record their own wall time.
+"""
+
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from scraper import config
+
+log = logging.getLogger(__name__)
+
+HTTP_COUNTERS = ("requests", "bytes", "retries", "throttled", "errors")
+
+_lock = threading.Lock()
+_stages = defaultdict(list)
+_http = defaultdict(Counter)
+_counters = Counter()
+
+
+def record(name, seconds):
+    with _lock:
+        _stages[name].append(seconds)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def count_http(host, **counts):
+    """Adds to a host's HTTP_COUNTERS, e.g. count_http(host, requests=1, bytes=n)."""
+    with _lock:
+        _http[host].update(counts)
+
+
+def incr(name, n=1):
+    with _lock:
+        _counters[name] += n
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _http.clear()
+        _counters.clear()
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary():
+    with _lock:
+        stages = {name: sorted(times) for name, times in _stages.items()}
+        http = {host: dict(counts) for host, counts in _http.items()}
+        counters = dict(_counters)
+    return {
+        "stages": {
+            name: {
+                "calls": len(times),
+                "total_s": round(sum(times), 3),
+                "p50_ms": round(_percentile(times, 0.50) * 1000, 1),
+                "p95_ms": round(_percentile(times, 0.95) * 1000, 1),
+                "max_ms": round(times[-1] * 1000, 1),
+            }
+            for name, times in sorted(stages.items())
+        },
+        "http": {host: {key: counts.get(key, 0) for key in HTTP_COUNTERS} for host, counts in sorted(http.items())},
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def log_summary(data=None):
+    data = data or summary()
+    for host, c in data["http"].items():
+        log.info(
+            f"HTTP {host}: {c['requests']} requests, {c['bytes'] / 1024:.0f} KB, {c['retries']} retries, "
+            f"{c['errors']} errors, {c['throttled']} throttled"
+        )
+    for name, s in data["stages"].items():
+        log.info(f"Stage {name}: {s['calls']} calls, {s['total_s']:.1f}s total, p50 {s['p50_ms']:.0f}ms, p95 {s['p95_ms']:.0f}ms")
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_run_summary(task, seconds, ok=True):
+    """Logs the run's metrics and writes them where config asks.
+
+    METRICS_DIR gets <task>.json (the latest run) and a line in runs.jsonl;
+    METRICS_TEXTFILE_DIR, if set, gets stackerbot_<task>.prom.
+    """
+    data = {
+        "task": task,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "seconds": round(seconds, 3),
+        "ok": ok,
+        **summary(),
+    }
+    log_summary(data)
+    try:
+        if config.METRICS_DIR:
+            os.makedirs(config.METRICS_DIR, exist_ok=True)
+            _write_atomic(os.path.join(config.METRICS_DIR, f"{task}.json"), json.dumps(data, indent=1))
+            with open(os.path.join(config.METRICS_DIR, "runs.jsonl"), "a") as f:
+                f.write(json.dumps(data) + "\n")
+        if config.METRICS_TEXTFILE_DIR:
+            os.makedirs(config.METRICS_TEXTFILE_DIR, exist_ok=True)
+            _write_atomic(os.path.join(config.METRICS_TEXTFILE_DIR, f"stackerbot_{task}.prom"), prometheus_text(data))
+    except OSError as e:
+        log.warning(f"Could not write metrics: {e}")
+    return data
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in labels.items()) + "}"
+
+
+def prometheus_text(data):
+    """The run summary in the Prometheus text exposition format."""
+    task = data["task"]
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        # A sample is (labels, value), or (labels, value, suffix) for the
+        # _sum/_count series of a summary.
+        lines.append(f"# HELP stackerbot_{name} {help_text}")
+        lines.append(f"# TYPE stackerbot_{name} {kind}")
+        for labels, value, *suffix in samples:
+            lines.append(f"stackerbot_{name}{''.join(suffix)}{_labels(task=task, **labels)} {value}")
+
+    metric("last_run_timestamp_seconds", "gauge", "When the task last finished.",
+           [({}, datetime.fromisoformat(data["finished_at"]).timestamp())])
+    metric("last_run_duration_seconds", "gauge", "Wall time of the last run.", [({}, data["seconds"])])
+    metric("last_run_success", "gauge", "1 if the last run finished without an exception.", [({}, int(data["ok"]))])
+    stage_samples = []
+    for name, s in data["stages"].items():
+        stage_samples += [({"stage": name, "quantile": "0.5"}, s["p50_ms"] / 1000),
+                          ({"stage": name, "quantile": "0.95"}, s["p95_ms"] / 1000),
+                          ({"stage": name}, s["total_s"], "_sum"),
+                          ({"stage": name}, s["calls"], "_count")]
+    metric("stage_seconds", "summary", "Stage latency in the last run.", stage_samples)
+    for key in HTTP_COUNTERS:
+        metric(f"http_{key}", "gauge", f"HTTP {key} per host in the last run.",
+               [({"host": host}, c[key]) for host, c in data["http"].items()])
+    metric("events", "gauge", "Task counters from the last run.",
+           [({"name": name}, value) for name, value in data["counters"].items()])
+    return "\n".join(lines) + "\n"
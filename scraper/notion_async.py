@@ -0,0 +1,148 @@
+"""asyncio Notion client with one keep-alive pool and a global rate cap.
+
+Async callers can await many operations at once; `run_sync()` lets the
+blocking code in notion_client (and the worker threads in the import
+pipeline) share the same client, pool and limiter through a background
+event loop.
+"""
+
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+from scraper import config, metrics
+from scraper.ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+NOTION_API = config.NOTION_API_URL
+NOTION_HOST = urlsplit(NOTION_API).hostname
+NOTION_VERSION = "2022-06-28"
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Shared by every client in the process, whichever loop it runs on.
+shared_limiter = TokenBucket(config.NOTION_REQUESTS_PER_SECOND)
+
+
+class AsyncNotionClient:
+    def __init__(self, limiter=None, max_retries=5, timeout=30):
+        self.limiter = limiter or shared_limiter
+        self.max_retries = max_retries
+        self._http = httpx.AsyncClient(
+            base_url=NOTION_API,
+            headers={
+                "Authorization": f"Bearer {config.NOTION_SECRET}",
+                "Content-Type": "application/json",
+                "Notion-Version": NOTION_VERSION,
+            },
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+        )
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def request(self, method, path, json=None, params=None):
+        """Sends one API call and returns the final httpx.Response.
+
+        429s wait out Retry-After (and hold the shared limiter, so other
+        callers back off too); 5xx and network errors retry with backoff.
+        Non-retryable error responses are returned for the caller to check.
+        """
+        attempt = 0
+        while True:
+            delay = self.limiter.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                response = await self._http.request(method, path, json=json, params=params)
+            except httpx.TransportError:
+                metrics.count_http(NOTION_HOST, requests=1, errors=1, retries=int(attempt > 0))
+                if attempt >= self.max_retries:
+                    raise
+                wait = 2**attempt
+            else:
+                metrics.count_http(
+                    NOTION_HOST,
+                    requests=1,
+                    bytes=len(response.content),
+                    retries=int(attempt > 0),
+                    throttled=int(response.status_code == 429),
+                )
+                if response.status_code == 429 and attempt < self.max_retries:
+                    wait = _retry_after(response)
+                    log.warning(f"Notion rate limited, retrying in {wait:.1f}s")
+                    self.limiter.hold(wait)
+                elif response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    wait = 2**attempt
+                else:
+                    return response
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    async def query(self, database_id, payload, filter_properties=None):
+        """filter_properties: property ids to return instead of all of them."""
+        params = [("filter_properties", prop_id) for prop_id in filter_properties or ()]
+        return await self.request("POST", f"databases/{database_id}/query", json=payload, params=params or None)
+
+    async def retrieve_database(self, database_id):
+        return await self.request("GET", f"databases/{database_id}")
+
+    async def create_page(self, payload):
+        return await self.request("POST", "pages", json=payload)
+
+    async def append_children(self, block_id, children):
+        return await self.request("PATCH", f"blocks/{block_id}/children", json={"children": children})
+
+    async def patch_page(self, page_id, payload):
+        return await self.request("PATCH", f"pages/{page_id}", json=payload)
+
+    async def set_cover(self, page_id, image_url):
+        return await self.patch_page(page_id, {"cover": {"type": "external", "external": {"url": image_url}}})
+
+
+def _retry_after(response):
+    try:
+        return max(float(response.headers.get("Retry-After", 1)), 0.0)
+    except ValueError:
+        return 1.0
+
+
+# --- Blocking bridge ---
+
+_loop = None
+_client = None
+_lock = threading.Lock()
+
+
+def _ensure_loop():
+    global _loop, _client
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="notion-async", daemon=True).start()
+            _client = asyncio.run_coroutine_threadsafe(_make_client(), _loop).result()
+    return _loop
+
+
+async def _make_client():
+    return AsyncNotionClient()
+
+
+def get_client():
+    """The process-wide client; only use it from coroutines on its loop."""
+    _ensure_loop()
+    return _client
+
+
+def submit(coro):
+    """Schedules coro on the shared loop and returns a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _ensure_loop())
+
+
+def run_sync(coro):
+    """Runs coro on the shared loop and blocks until it finishes."""
+    return submit(coro).result()
@@ -1,90 +1,205 @@
 import logging
+import threading
+from collections import namedtuple
 
-from scraper import config
-from scraper.utils import get_resilient_session, normalize_title, text_to_blocks_simple
+from scraper import config, metrics
+from scraper.block_writer import BlockWriter
+from scraper.notion_async import get_client, run_sync, submit
+from scraper.utils import normalize_title, title_words, transcript_to_blocks
 
 log = logging.getLogger(__name__)
 
-HEADERS = None
-
-
-def _headers():
-    global HEADERS
-    if HEADERS is None:
-        HEADERS = {
-            "Authorization": f"Bearer {config.NOTION_SECRET}",
-            "Content-Type": "application/json",
-            "Notion-Version": "2022-06-28",
-        }
-    return HEADERS
+# Thin blocking wrappers over the shared AsyncNotionClient: one keep-alive
+# pool, one rate limiter, Retry-After handling, whichever thread calls in.
 
 
 # --- Queries ---
 
+# A page as the scrapers see it: properties holds the plain value of each
+# requested property (text for title/rich_text, the URL, select name, date
+# start, ...) instead of Notion's nested JSON.
+PageRecord = namedtuple("PageRecord", "page_id last_edited_time has_cover properties")
 
-def get_all_notion_titles():
-    log.info("Syncing with Notion database (full history)...")
-    url = f"https://api.notion.com/v1/databases/{config.DATABASE_ID}/query"
+_property_ids = {}
+_property_ids_lock = threading.Lock()
 
-    normalized_titles = set()
-    has_more = True
-    next_cursor = None
 
-    try:
-        while has_more:
-            payload = {"page_size": 100}
-            if next_cursor:
-                payload["start_cursor"] = next_cursor
+def property_ids(names):
+    """Maps property names to the ids filter_properties expects.
 
-            session = get_resilient_session()
-            response = session.post(url, headers=_headers(), json=payload)
+    The database schema is fetched once per process. Returns None when it
+    cannot be read, meaning "don't project, fetch every property".
+    """
+    with _property_ids_lock:
+        if config.DATABASE_ID not in _property_ids:
+            try:
+                response = run_sync(get_client().retrieve_database(config.DATABASE_ID))
+            except Exception as e:
+                log.warning(f"Could not read database schema: {e}")
+                return None
             if response.status_code != 200:
-                log.error(f"Notion sync error: {response.status_code}")
-                break
+                log.warning(f"Could not read database schema: {response.status_code}")
+                return None
+            schema = response.json().get("properties", {})
+            _property_ids[config.DATABASE_ID] = {name: prop["id"] for name, prop in schema.items()}
+        ids = _property_ids[config.DATABASE_ID]
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        log.warning(f"Database has no properties named: {', '.join(missing)}")
+    return [ids[name] for name in names if name in ids]
+
+
+def _plain_value(prop):
+    kind = prop.get("type")
+    value = prop.get(kind)
+    if kind in ("title", "rich_text"):
+        return value[0].get("plain_text", "") if value else ""
+    if kind in ("select", "status"):
+        return value.get("name") if value else None
+    if kind == "multi_select":
+        return [option.get("name") for option in value or ()]
+    if kind == "date":
+        return value.get("start") if value else None
+    return value
+
+
+def page_record(page, names):
+    props = page.get("properties", {})
+    return PageRecord(
+        page["id"],
+        page.get("last_edited_time"),
+        bool(page.get("cover")),
+        {name: _plain_value(props[name]) if name in props else None for name in names},
+    )
 
-            data = response.json()
-            for page in data.get("results", []):
-                try:
-                    title_list = page.get("properties", {}).get("Name", {}).get("title", [])
-                    if title_list:
-                        raw_title = title_list[0].get("plain_text", "")
-                        normalized_titles.add(normalize_title(raw_title))
-                except Exception:
-                    continue
 
-            has_more = data.get("has_more", False)
-            next_cursor = data.get("next_cursor")
+def iter_query_pages(properties, filter_payload=None, strict=False):
+    """Like iter_notion_pages, but only the named properties are requested
+    and pages come back as PageRecords."""
+    for page in iter_notion_pages(filter_payload, strict=strict, filter_properties=property_ids(properties)):
+        yield page_record(page, properties)
+
+
+def query_pages(properties, filter_payload=None, strict=False):
+    return list(iter_query_pages(properties, filter_payload, strict=strict))
+
+
+# Longest distinctive words of a title used for the "Name contains" part of
+# a lookup, and how many a title needs before a lookup can be trusted.
+LOOKUP_WORDS = 8
+LOOKUP_MIN_WORDS = 2
+
+
+def lookup_words(title):
+    words = sorted((w for w in title_words(title) if len(w) >= 4), key=lambda w: (-len(w), w))
+    return words[:LOOKUP_WORDS]
+
+
+def _lookup_filter(title, url):
+    conditions = [{"property": "Name", "title": {"contains": w}} for w in lookup_words(title)]
+    if url:
+        conditions.append({"property": "URL", "url": {"equals": url}})
+    return {"or": conditions}
+
+
+async def _lookup(client, title, url, filter_properties):
+    """One page of matches for a post, or None if there are more than that:
+    paging through a common word's matches would cost more than the full
+    read the lookup is meant to avoid."""
+    payload = {"filter": _lookup_filter(title, url), "page_size": 100}
+    response = await client.query(config.DATABASE_ID, payload, filter_properties)
+    if response.status_code != 200:
+        raise RuntimeError(f"Notion query error: {response.status_code} {response.text}")
+    data = response.json()
+    if data.get("has_more"):
+        return None
+    titles = set()
+    for page in data.get("results", []):
+        record = page_record(page, ["Name", "URL"])
+        titles.add(normalize_title(record.properties["Name"]))
+        if url and record.properties["URL"] == url:
+            # Same post under a retitled page: make sure it dedupes.
+            titles.add(normalize_title(title))
+    return titles
+
+
+@metrics.timed("lookup")
+def lookup_titles(posts):
+    """Normalized titles of the pages that could duplicate any of posts.
+
+    posts are (title, url) pairs. Each post is one filtered query, run
+    concurrently, for a single page of results: pages with the same URL or
+    whose Name contains one of the post's distinctive words (stop words
+    dropped, 4+ letters). That finds exact and retitled duplicates and
+    near-duplicates sharing at least one such word whole; a fuzzy match
+    that changed every one of them is missed.
+
+    Returns None, without querying, if a title has fewer than
+    LOOKUP_MIN_WORDS distinctive words, and None if any post matches more
+    than one page of results: callers should read all titles instead.
+    Raises if a query fails.
+    """
+    if any(len(lookup_words(title)) < LOOKUP_MIN_WORDS for title, _ in posts):
+        return None
+    client = get_client()
+    filter_properties = property_ids(["Name", "URL"])
+    futures = [submit(_lookup(client, title, url, filter_properties)) for title, url in posts]
+    results = [future.result() for future in futures]
+    if any(found is None for found in results):
+        return None
+    titles = set().union(*results)
+    titles.discard("")
+    return titles
 
-        log.info(f"Sync complete. Found {len(normalized_titles)} existing posts.")
-        return normalized_titles
 
+def get_all_notion_titles():
+    log.info("Syncing with Notion database (full history)...")
+    try:
+        records = query_pages(["Name"], {"page_size": 100})
     except Exception as e:
         log.error(f"Connection error during sync: {e}")
         return set()
 
+    normalized_titles = {normalize_title(r.properties["Name"]) for r in records if r.properties["Name"]}
+    log.info(f"Sync complete. Found {len(normalized_titles)} existing posts.")
+    return normalized_titles
 
-def get_all_notion_pages(filter_payload=None):
-    log.info("Fetching pages from Notion...")
-    url = f"https://api.notion.com/v1/databases/{config.DATABASE_ID}/query"
-
-    payload = filter_payload or {}
-    pages = []
-    has_more = True
-    next_cursor = None
-
-    while has_more:
-        if next_cursor:
-            payload["start_cursor"] = next_cursor
-        session = get_resilient_session()
-        response = session.post(url, headers=_headers(), json=payload)
-        if response.status_code != 200:
-            log.error(f"Notion query error: {response.text}")
-            break
-        data = response.json()
-        pages.extend(data.get("results", []))
-        has_more = data.get("has_more", False)
-        next_cursor = data.get("next_cursor")
 
+def iter_notion_pages(filter_payload=None, strict=False, filter_properties=None):
+    """Yields every page matching filter_payload as each batch arrives.
+
+    The next batch is requested in the background while the caller works
+    through the current one. With strict=True a failed query raises instead
+    of ending the walk early, for callers that must not mistake a partial
+    walk for the whole database.
+    """
+    client = get_client()
+    payload = dict(filter_payload or {})
+    future = submit(client.query(config.DATABASE_ID, payload, filter_properties))
+    try:
+        while future:
+            response = future.result()
+            future = None
+            if response.status_code != 200:
+                if strict:
+                    raise RuntimeError(f"Notion query error: {response.status_code} {response.text}")
+                log.error(f"Notion query error: {response.text}")
+                return
+            data = response.json()
+            if data.get("has_more") and data.get("next_cursor"):
+                next_payload = {**payload, "start_cursor": data["next_cursor"]}
+                future = submit(client.query(config.DATABASE_ID, next_payload, filter_properties))
+            yield from data.get("results", [])
+    finally:
+        if future:
+            future.cancel()
+
+
+def get_all_notion_pages(filter_payload=None, strict=False, filter_properties=None):
+    """Returns every page matching filter_payload; see iter_notion_pages."""
+    log.info("Fetching pages from Notion...")
+    pages = list(iter_notion_pages(filter_payload, strict=strict, filter_properties=filter_properties))
     log.info(f"Found {len(pages)} pages.")
     return pages
 
@@ -98,9 +213,7 @@ def get_incomplete_pages():
 # --- Create / Update ---
 
 
-def create_notion_page(data):
-    url = "https://api.notion.com/v1/pages"
-
+def page_properties(data):
     props = {
         "Name": {"title": [{"text": {"content": str(data["title"])[:2000]}}]},
         "Date": {"date": {"start": data["date"]}},
@@ -113,7 +226,10 @@ def create_notion_page(data):
         props["URL"] = {"url": data["url"]}
     if data.get("yt_url"):
         props["YouTube URL"] = {"url": data["yt_url"]}
+    return props
+
 
+def page_children(data):
     children = []
     children.append({"object": "block", "type": "table_of_contents", "table_of_contents": {}})
     children.append({"object": "block", "type": "divider", "divider": {}})
@@ -148,54 +264,67 @@ def create_notion_page(data):
                     ]
                 },
             })
-            children.extend(text_to_blocks_simple(data["transcript"]))
+            children.extend(transcript_to_blocks(data["transcript"]))
+    return children
 
-    session = get_resilient_session()
-    try:
-        # Create page with empty children first, then append in batches
-        payload = {"parent": {"database_id": config.DATABASE_ID}, "properties": props, "children": []}
-        response = session.post(url, headers=_headers(), json=payload)
-
-        if response.status_code != 200:
-            log.error(f"Notion create error: {response.text}")
-            return False
-
-        page_id = response.json()["id"]
-
-        if children:
-            append_url = f"https://api.notion.com/v1/blocks/{page_id}/children"
-            for i in range(0, len(children), 100):
-                batch = children[i : i + 100]
-                try:
-                    session.patch(append_url, headers=_headers(), json={"children": batch})
-                except Exception:
-                    pass
-        return True
 
-    except Exception as e:
-        log.error(f"Network error creating page: {e}")
+def _create_payload(data):
+    payload = {"parent": {"database_id": config.DATABASE_ID}, "properties": page_properties(data)}
+    if data.get("cover"):
+        payload["cover"] = {"type": "external", "external": {"url": data["cover"]}}
+    return payload
+
+
+@metrics.timed("notion_create")
+def create_page(data, children=(), on_batch=None):
+    """Creates the page with its properties, cover and as many of children
+    as fit in the one request. Returns (page_id, blocks written), or
+    (None, 0) if the page could not be created."""
+    writer = BlockWriter(list(children), on_batch=on_batch)
+    page_id = writer.create(_create_payload(data))
+    return page_id, writer.written
+
+
+@metrics.timed("notion_append")
+def append_children(page_id, children, start=0, on_batch=None):
+    """Appends children[start:] in as few requests as fit and returns how
+    many are on the page. Stops at the first batch that cannot be written;
+    on_batch is called with the running count after each one that lands."""
+    writer = BlockWriter(children, written=start, on_batch=on_batch)
+    writer.append(page_id)
+    return writer.written
+
+
+def create_notion_page(data):
+    writer = BlockWriter(page_children(data))
+    with metrics.stage("notion_create"):
+        page_id = writer.create(_create_payload(data))
+    if not page_id:
         return False
+    with metrics.stage("notion_append"):
+        writer.append(page_id)
+    if not writer.complete:
+        # The page exists, so it counts as imported; the missing tail is logged.
+        log.error(f"Page created with partial content: {data['title'][:60]}")
+    return True
 
 
+@metrics.timed("notion_update")
 def set_page_cover(page_id, image_url):
-    url = f"https://api.notion.com/v1/pages/{page_id}"
-    payload = {"cover": {"type": "external", "external": {"url": image_url}}}
-
-    session = get_resilient_session()
-    response = session.patch(url, headers=_headers(), json=payload)
+    response = run_sync(get_client().set_cover(page_id, image_url))
     if response.status_code == 200:
         log.info("Cover updated.")
-    else:
-        log.error(f"Cover update failed: {response.text}")
+        return True
+    log.error(f"Cover update failed: {response.text}")
+    return False
 
 
+@metrics.timed("notion_update")
 def update_notion_page(page_id, video_url, transcript, is_native=False):
-    url_page = f"https://api.notion.com/v1/pages/{page_id}"
-    url_blocks = f"https://api.notion.com/v1/blocks/{page_id}/children"
-    session = get_resilient_session()
+    client = get_client()
 
     if not is_native:
-        session.patch(url_page, headers=_headers(), json={"properties": {"YouTube URL": {"url": video_url}}})
+        run_sync(client.patch_page(page_id, {"properties": {"YouTube URL": {"url": video_url}}}))
 
     children = []
     children.append({"object": "block", "type": "divider", "divider": {}})
@@ -225,12 +354,11 @@ def update_notion_page(page_id, video_url, transcript, is_native=False):
                 ]
             },
         })
-        children.extend(text_to_blocks_simple(transcript))
+        children.extend(transcript_to_blocks(transcript))
 
-    for i in range(0, len(children), 100):
-        try:
-            session.patch(url_blocks, headers=_headers(), json={"children": children[i : i + 100]})
-        except Exception:
-            pass
+    if append_children(page_id, children) < len(children):
+        log.error("Page only partly updated.")
+        return False
 
     log.info("Page updated.")
+    return True
@@ -0,0 +1,99 @@
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from scraper import config, metrics
+from scraper.utils import normalize_title
+
+log = logging.getLogger(__name__)
+
+
+class ImportPipeline:
+    """Runs post imports on a bounded worker pool while deduping in order.
+
+    Titles are deduped on the calling thread in submission order and
+    reserved in the title index before their import starts. When a new
+    title only duplicates one that is still in flight, submit() waits for
+    that import: if it failed, its reservation is released and the new post
+    gets its turn, exactly as the sequential loop behaved.
+    """
+
+    def __init__(self, existing_titles, workers=None):
+        self.titles = existing_titles
+        self.workers = workers or config.SYNC_WORKERS
+        self.imported = 0
+        self.failed = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._in_flight = {}
+        self._reserved = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, title, fn, *args):
+        """Queues fn(*args) unless title is already in the database.
+
+        fn returns truthy on success. Returns False when the post was
+        skipped as a duplicate.
+        """
+        norm = normalize_title(title)
+        while True:
+            with metrics.stage("dedupe"):
+                match = self.titles.find_duplicate(norm)
+            if match is None:
+                break
+            if match not in self._in_flight:
+                metrics.incr("posts_skipped")
+                return False
+            wait([self._in_flight[match]])
+            self._settle(match)
+
+        self._start(norm, fn, args)
+        return True
+
+    def resume(self, title, fn, *args):
+        """Queues fn(*args) for a post that already passed dedupe on an
+        earlier run, reserving its title without checking it again."""
+        norm = normalize_title(title)
+        if norm in self._in_flight:
+            wait([self._in_flight[norm]])
+            self._settle(norm)
+        self._start(norm, fn, args)
+
+    def _start(self, norm, fn, args):
+        while len(self._in_flight) >= self.workers * 2:
+            done, _ = wait(self._in_flight.values(), return_when=FIRST_COMPLETED)
+            for key in [k for k, f in self._in_flight.items() if f in done]:
+                self._settle(key)
+
+        if norm not in self.titles:
+            self.titles.add(norm)
+            self._reserved.add(norm)
+        self._in_flight[norm] = self._executor.submit(fn, *args)
+
+    def close(self):
+        wait(list(self._in_flight.values()))
+        for key in list(self._in_flight):
+            self._settle(key)
+        self._executor.shutdown()
+
+    def _settle(self, norm):
+        future = self._in_flight.pop(norm)
+        try:
+            ok = future.result()
+        except Exception as e:
+            log.error(f"Import failed: {e}")
+            ok = False
+        if ok:
+            self.imported += 1
+            metrics.incr("posts_imported")
+        else:
+            self.failed += 1
+            metrics.incr("posts_failed")
+            # Only release reservations this pipeline made; a resumed post
+            # may share its title with a page that is already in Notion.
+            if norm in self._reserved:
+                self.titles.discard(norm)
+        self._reserved.discard(norm)
@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by everything that talks to one API.
+
+    `reserve()` takes a token immediately and returns how long the caller has
+    to wait before using it, so the bucket works for both blocking callers
+    (`acquire()`) and ones that prefer to sleep some other way.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    def hold(self, seconds):
+        """Makes every caller wait at least `seconds` from now, e.g. after a 429."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens = min(self._tokens, -seconds * self.rate)
@@ -0,0 +1,357 @@
+"""Local SQLite mirror of the Notion database, refreshed incrementally."""
+
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from scraper import config, metrics, notion_client
+from scraper.utils import get_video_id_from_url, normalize_title
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    title_norm TEXT NOT NULL DEFAULT '',
+    url TEXT,
+    youtube_url TEXT,
+    video_id TEXT,
+    has_cover INTEGER NOT NULL DEFAULT 0,
+    last_edited_time TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_title_norm ON pages (title_norm);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS cover_failures (
+    page_id TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    next_attempt_at TEXT NOT NULL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS video_checks (
+    page_id TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    next_check_at TEXT NOT NULL,
+    last_result TEXT
+);
+CREATE TABLE IF NOT EXISTS backfill_journal (
+    post_id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT,
+    date TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    data TEXT,
+    page_id TEXT,
+    appended INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+"""
+
+_conn = None
+_lock = threading.RLock()
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        path = config.STATE_DB_PATH
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(path, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def get_meta(key, default=None):
+    with _lock:
+        row = _db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_meta(key, value):
+    with _lock:
+        db = _db()
+        _put_meta(db, key, value)
+        db.commit()
+
+
+def _put_meta(db, key, value):
+    db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+# The only properties the store keeps; everything else is left in Notion.
+PROPERTIES = ["Name", "URL", "YouTube URL"]
+
+
+def _page_row(record):
+    title = record.properties.get("Name") or ""
+    youtube_url = record.properties.get("YouTube URL")
+    return (
+        record.page_id,
+        title,
+        normalize_title(title),
+        record.properties.get("URL"),
+        youtube_url,
+        get_video_id_from_url(youtube_url),
+        1 if record.has_cover else 0,
+        record.last_edited_time,
+    )
+
+
+def _insert_pages(db, records):
+    rows = [_page_row(record) for record in records]
+    db.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def upsert_pages(records):
+    with _lock:
+        db = _db()
+        count = _insert_pages(db, records)
+        db.commit()
+    return count
+
+
+def _full_refresh_due():
+    last_full = get_meta("last_full_refresh")
+    if not last_full or get_meta("database_id") != config.DATABASE_ID:
+        return True
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(last_full)
+    return age > timedelta(days=config.STATE_FULL_REFRESH_DAYS)
+
+
+def is_warm():
+    """True when refresh() would be incremental rather than a full rebuild."""
+    return not _full_refresh_due()
+
+
+@metrics.timed("state_refresh")
+def refresh():
+    """Pulls pages edited since the last run into the local store.
+
+    A full rebuild happens on first use, when DATABASE_ID changes, and every
+    STATE_FULL_REFRESH_DAYS so pages deleted in Notion eventually drop out.
+    """
+    full = _full_refresh_due()
+    watermark = None if full else get_meta("pages_watermark")
+
+    payload = {"sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}]}
+    if watermark:
+        log.info(f"Refreshing local state (edited since {watermark})...")
+        payload["filter"] = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": watermark}}
+    else:
+        log.info("Rebuilding local state from Notion (full history)...")
+
+    # Pages are written as each batch arrives, in one transaction, so a
+    # failed walk rolls back instead of leaving a partial rebuild behind.
+    changed = 0
+    newest = None
+    with _lock:
+        db = _db()
+        try:
+            if full:
+                db.execute("DELETE FROM pages")
+            if get_meta("database_id") != config.DATABASE_ID:
+                # Cover and video bookkeeping belongs to the old database.
+                db.execute("DELETE FROM cover_failures")
+                db.execute("DELETE FROM video_checks")
+                db.execute("DELETE FROM meta WHERE key = 'covers_watermark'")
+
+            records = notion_client.iter_query_pages(PROPERTIES, payload, strict=True)
+            while True:
+                batch = list(islice(records, 100))
+                if not batch:
+                    break
+                changed += _insert_pages(db, batch)
+                edited = [r.last_edited_time for r in batch if r.last_edited_time]
+                if edited:
+                    newest = max(edited + ([newest] if newest else []))
+
+            if newest:
+                _put_meta(db, "pages_watermark", newest)
+            if full:
+                _put_meta(db, "database_id", config.DATABASE_ID)
+                _put_meta(db, "last_full_refresh", datetime.now(timezone.utc).isoformat())
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.error(f"Connection error during state refresh: {e}")
+            return
+
+    log.info(f"State refreshed: {changed} changed, {count_pages()} pages total.")
+
+
+def count_pages():
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+
+def existing_titles():
+    with _lock:
+        rows = _db().execute("SELECT title_norm FROM pages WHERE title_norm != ''").fetchall()
+    return {row["title_norm"] for row in rows}
+
+
+def pages_missing_cover(since=None):
+    """Pages without a cover that are worth a lookup now.
+
+    That is pages edited at or after `since` that have not failed before,
+    plus earlier failures whose retry time has come. Notion's
+    last_edited_time has minute precision, so pages in the watermark's own
+    minute are looked at again rather than missed.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    with _lock:
+        return _db().execute(
+            "SELECT pages.* FROM pages LEFT JOIN cover_failures f ON f.page_id = pages.page_id "
+            "WHERE has_cover = 0 AND IFNULL(url, '') != '' AND ("
+            "  (f.page_id IS NULL AND (? IS NULL OR last_edited_time >= ?)) OR f.next_attempt_at <= ?"
+            ") ORDER BY last_edited_time",
+            (since, since, now),
+        ).fetchall()
+
+
+def _backoff(attempts, hours, max_days):
+    """When to try again after `attempts` misses: hours, then doubling, capped."""
+    delay = min(timedelta(hours=hours * 2 ** (attempts - 1)), timedelta(days=max_days))
+    return (datetime.now(timezone.utc) + delay).isoformat()
+
+
+def record_cover_failure(page_id, error):
+    with _lock:
+        db = _db()
+        row = db.execute("SELECT attempts FROM cover_failures WHERE page_id = ?", (page_id,)).fetchone()
+        attempts = (row["attempts"] if row else 0) + 1
+        next_attempt = _backoff(attempts, config.COVER_RETRY_HOURS, config.COVER_RETRY_MAX_DAYS)
+        db.execute(
+            "INSERT OR REPLACE INTO cover_failures VALUES (?, ?, ?, ?)",
+            (page_id, attempts, next_attempt, error),
+        )
+        db.commit()
+    return next_attempt
+
+
+def clear_cover_failure(page_id):
+    with _lock:
+        db = _db()
+        db.execute("DELETE FROM cover_failures WHERE page_id = ?", (page_id,))
+        db.commit()
+
+
+def pages_missing_video():
+    """Pages without a video link that are due a check: never checked, or
+    checked without finding one and now past their re-check time. Pages
+    repaired with a native Substack video never get a link, so they are
+    skipped by their video_checks row instead."""
+    now = datetime.now(timezone.utc).isoformat()
+    with _lock:
+        return _db().execute(
+            "SELECT pages.* FROM pages LEFT JOIN video_checks c ON c.page_id = pages.page_id "
+            "WHERE IFNULL(youtube_url, '') = '' AND IFNULL(url, '') != '' "
+            "AND (c.page_id IS NULL OR (c.next_check_at != '' AND c.next_check_at <= ?)) ORDER BY last_edited_time DESC",
+            (now,),
+        ).fetchall()
+
+
+def count_video_checks_waiting():
+    now = datetime.now(timezone.utc).isoformat()
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM video_checks WHERE next_check_at > ?", (now,)).fetchone()[0]
+
+
+def record_video_miss(page_id, result):
+    """Remembers that a page had no usable video; returns when to look again."""
+    with _lock:
+        db = _db()
+        row = db.execute("SELECT attempts FROM video_checks WHERE page_id = ?", (page_id,)).fetchone()
+        attempts = (row["attempts"] if row else 0) + 1
+        next_check = _backoff(attempts, config.VIDEO_RECHECK_HOURS, config.VIDEO_RECHECK_MAX_DAYS)
+        db.execute(
+            "INSERT OR REPLACE INTO video_checks VALUES (?, ?, ?, ?)",
+            (page_id, attempts, next_check, result),
+        )
+        db.commit()
+    return next_check
+
+
+def record_native_video(page_id):
+    """Marks a page as repaired from its Substack video. The Notion page
+    keeps an empty YouTube URL, so this row (with no re-check time) is what
+    keeps it out of pages_missing_video."""
+    with _lock:
+        db = _db()
+        db.execute("INSERT OR REPLACE INTO video_checks VALUES (?, 0, '', 'native')", (page_id,))
+        db.commit()
+
+
+def clear_video_miss(page_id):
+    with _lock:
+        db = _db()
+        db.execute("DELETE FROM video_checks WHERE page_id = ?", (page_id,))
+        db.commit()
+
+
+# --- Backfill journal ---
+#
+# One row per archive post, keyed by Substack post id. status moves through
+# pending -> scraped -> page_created -> children_appended -> done (or
+# skipped for duplicates); data holds the scraped post until it is done.
+
+JOURNAL_FINISHED = ("done", "skipped")
+
+
+def journal_reset():
+    with _lock:
+        db = _db()
+        db.execute("DELETE FROM backfill_journal")
+        db.execute("DELETE FROM meta WHERE key = 'backfill_archive_complete'")
+        db.commit()
+
+
+def journal_add(post_id, title, url, date):
+    """Records an archive post (no-op if already journaled) and returns its row."""
+    with _lock:
+        db = _db()
+        seq = db.execute("SELECT COUNT(*) FROM backfill_journal").fetchone()[0]
+        db.execute(
+            "INSERT OR IGNORE INTO backfill_journal (post_id, seq, title, url, date, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (post_id, seq, title, url, date, datetime.now(timezone.utc).isoformat()),
+        )
+        db.commit()
+        return journal_get(post_id)
+
+
+def journal_get(post_id):
+    with _lock:
+        return _db().execute("SELECT * FROM backfill_journal WHERE post_id = ?", (post_id,)).fetchone()
+
+
+def journal_update(post_id, **fields):
+    fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with _lock:
+        db = _db()
+        db.execute(f"UPDATE backfill_journal SET {columns} WHERE post_id = ?", (*fields.values(), post_id))
+        db.commit()
+
+
+def journal_unfinished():
+    with _lock:
+        return _db().execute(
+            "SELECT * FROM backfill_journal WHERE status NOT IN (?, ?) ORDER BY seq", JOURNAL_FINISHED
+        ).fetchall()
+
+
+def journal_count():
+    with _lock:
+        return _db().execute("SELECT COUNT(*) FROM backfill_journal").fetchone()[0]
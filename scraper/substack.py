@@ -1,129 +1,264 @@
 import logging
 import re
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 import feedparser
-import requests
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 
-from scraper import config
-from scraper.html_parser import html_to_notion_blocks
-from scraper.utils import get_resilient_session, get_video_id_from_url
+from scraper import config, http_cache, http_client, metrics
+from scraper.html_parser import html_to_notion_blocks, make_soup
+from scraper.utils import get_video_id_from_url
 
 log = logging.getLogger(__name__)
 
 
+@metrics.timed("feed")
 def fetch_rss_entries():
     log.info(f"Fetching RSS from {config.SUBSTACK_RSS_URL}")
-    feed = feedparser.parse(config.SUBSTACK_RSS_URL)
+    try:
+        response = http_cache.get(config.SUBSTACK_RSS_URL)
+    except Exception as e:
+        log.error(f"RSS fetch error: {e}")
+        return []
+    feed = feedparser.parse(response.content, response_headers=http_cache.feed_headers(response))
     log.info(f"Found {len(feed.entries)} entries in RSS feed.")
     return feed.entries
 
 
-def fetch_full_archive():
-    """Fetches ALL posts via Substack's archive API (not limited to 20 like RSS)."""
+ARCHIVE_PAGE_SIZE = 50
+ARCHIVE_MAX_OFFSET = 10000
+
+
+@metrics.timed("feed")
+def _fetch_archive_batch(base_url, offset):
+    r = http_client.get(
+        f"{base_url}/api/v1/archive?sort=new&offset={offset}&limit={ARCHIVE_PAGE_SIZE}",
+        cookie=True,
+        timeout=15,
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"Archive API error: {r.status_code} at offset {offset}")
+    batch = r.json()
+    if not isinstance(batch, list):
+        raise RuntimeError(f"Archive API returned {type(batch).__name__} at offset {offset}, expected a list")
+    return batch
+
+
+def iter_archive(prefetch=None, start=0):
+    """Yields ALL posts via Substack's archive API, newest first, as batches land.
+
+    The next `prefetch` batches (ARCHIVE_PREFETCH) are requested in the
+    background while the caller works on the current one. Closing the
+    generator early cancels whatever is still queued. `start` skips that
+    many posts, rounded down to a whole batch.
+
+    The generator only finishes normally once the archive is exhausted; an
+    API error or unexpected payload raises RuntimeError instead.
+    """
     base_url = config.SUBSTACK_RSS_URL.replace("/feed", "")
     log.info(f"Fetching full archive from {base_url}")
 
-    headers = config.BROWSER_HEADERS.copy()
-    if config.SUBSTACK_COOKIE:
-        headers["Cookie"] = config.SUBSTACK_COOKIE
-
-    all_posts = []
-    offset = 0
-    while offset < 10000:
-        r = requests.get(
-            f"{base_url}/api/v1/archive?sort=new&offset={offset}&limit=50",
-            headers=headers,
-            timeout=15,
-        )
-        if r.status_code != 200:
-            log.error(f"Archive API error: {r.status_code} at offset {offset}")
-            break
-        batch = r.json()
-        if not isinstance(batch, list) or not batch:
-            break
-        all_posts.extend(batch)
-        log.info(f"  Fetched {len(all_posts)} posts so far...")
-        if len(batch) < 50:
-            break
-        offset += 50
-
-    log.info(f"Full archive: {len(all_posts)} total posts.")
-    return all_posts
+    prefetch = max(1, prefetch or config.ARCHIVE_PREFETCH)
+    offsets = iter(range(start - start % ARCHIVE_PAGE_SIZE, ARCHIVE_MAX_OFFSET, ARCHIVE_PAGE_SIZE))
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque(executor.submit(_fetch_archive_batch, base_url, o) for o in islice(offsets, prefetch))
+    fetched = 0
+    try:
+        while pending:
+            batch = pending.popleft().result()
+            if not batch:
+                break
+            offset = next(offsets, None)
+            if offset is not None and len(batch) == ARCHIVE_PAGE_SIZE:
+                pending.append(executor.submit(_fetch_archive_batch, base_url, offset))
+            fetched += len(batch)
+            log.info(f"  Fetched {fetched} posts so far...")
+            yield from batch
+            if len(batch) < ARCHIVE_PAGE_SIZE:
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+    log.info(f"Full archive: {fetched} total posts.")
 
 
-def parse_substack_content(url):
-    headers = config.BROWSER_HEADERS.copy()
-    if config.SUBSTACK_COOKIE:
-        headers["Cookie"] = config.SUBSTACK_COOKIE
-    session = get_resilient_session()
+def fetch_full_archive():
+    """Fetches ALL posts via Substack's archive API (not limited to 20 like RSS)."""
+    return list(iter_archive())
+
+
+class PostPage(namedtuple("PostPage", "blocks youtube_id iframe_youtube_id vtt_url cover_url")):
+    """Everything the tasks need from one Substack post page.
+
+    youtube_id is the video the article body embeds or links to;
+    iframe_youtube_id is the first YouTube iframe anywhere on the page.
+    """
+
+    def video(self):
+        """(kind, data) as find_video_on_substack_page reports it."""
+        if self.vtt_url:
+            return "native_vtt", self.vtt_url
+        if self.iframe_youtube_id:
+            return "youtube", self.iframe_youtube_id
+        return None, None
+
+
+EMPTY_PAGE = PostPage([], None, None, None, None)
+
+# What parse_post_html can pull out of a page; tasks ask only for what they use.
+CONTENT, COVER, VIDEO = "content", "cover", "video"
+ALL_PARTS = (CONTENT, COVER, VIDEO)
+CONTENT_CLASSES = {"available-content", "body"}
+VTT_RE = re.compile(r"(https?:[^\"']+\.vtt)")
+# Where a cover lookup can stop reading: the end of <head>, or the first
+# og:image or twitter:image tag.
+COVER_READ_END_RE = re.compile(rb"</head\s*>|<meta[^>]+(?:og|twitter):image[\"'][^>]*>", re.IGNORECASE)
+
+
+class _PostStrainer(SoupStrainer):
+    """Keeps only the elements the requested parts are read from: the
+    cover <meta> tags, the article container and iframes. Everything else
+    (navigation, comments, the hydration script) never becomes a Tag.
+
+    Uses the tag-creation hook of bs4 4.13+; older versions ignore it and
+    build the whole tree, which gives the same result, just slower.
+    """
+
+    def __init__(self, parts):
+        super().__init__()
+        self.parts = parts
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        attrs = attrs or {}
+        if name == "meta":
+            return COVER in self.parts and (attrs.get("property") == "og:image" or attrs.get("name") == "twitter:image")
+        if name == "iframe":
+            return VIDEO in self.parts
+        if CONTENT not in self.parts:
+            return False
+        if name == "article":
+            return True
+        classes = attrs.get("class") or ()
+        if isinstance(classes, str):
+            classes = classes.split()
+        return name == "div" and not CONTENT_CLASSES.isdisjoint(classes)
+
+    def allow_string_creation(self, string):
+        return False
+
+
+def extract_post(url, parts=ALL_PARTS):
+    """Fetches and parses a post page once, returning a PostPage with the
+    requested parts filled in, or EMPTY_PAGE if the page could not be read."""
+    if not url:
+        return EMPTY_PAGE
     try:
-        response = session.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        content_div = (
-            soup.find("div", class_="available-content")
-            or soup.find("div", class_="body")
-            or soup.find("article")
-        )
-        if content_div:
-            return html_to_notion_blocks(content_div)
+        return _fetch_post(url, parts)
     except Exception as e:
         log.error(f"Scrape error for {url}: {e}")
-    return [], None
+        return EMPTY_PAGE
+
+
+def _fetch_post(url, parts):
+    with metrics.stage("scrape"):
+        response = http_cache.get(url, cookie=True)
+    if response.status_code != 200:
+        raise RuntimeError(f"status {response.status_code}")
+    return parse_post_html(response.text, parts=parts)
+
+
+@metrics.timed("parse")
+def parse_post_html(html, backend=None, parts=ALL_PARTS):
+    soup = make_soup(html, backend, parse_only=_PostStrainer(parts))
+    return _post_page(soup, html, parts)
+
+
+def _post_page(soup, html, parts):
+    blocks, youtube_id = [], None
+    if CONTENT in parts:
+        try:
+            content_div = (
+                soup.find("div", class_="available-content")
+                or soup.find("div", class_="body")
+                or soup.find("article")
+            )
+            if content_div:
+                blocks, youtube_id = html_to_notion_blocks(content_div)
+        except Exception as e:
+            log.error(f"Content parse error: {e}")
+
+    if VIDEO in parts:
+        iframe_youtube_id, vtt_url = _find_iframe_video(soup), _find_vtt_url(html)
+    else:
+        iframe_youtube_id, vtt_url = None, None
+    return PostPage(blocks, youtube_id, iframe_youtube_id, vtt_url, _find_cover(soup) if COVER in parts else None)
+
+
+def _find_cover(soup):
+    og_image = soup.find("meta", property="og:image")
+    if og_image and og_image.get("content"):
+        return og_image["content"]
+
+    twitter_img = soup.find("meta", attrs={"name": "twitter:image"})
+    if twitter_img and twitter_img.get("content"):
+        return twitter_img["content"]
+    return None
+
+
+def _find_vtt_url(html):
+    # Matches the plain and the JSON-escaped (https:\/\/...) form alike.
+    match = VTT_RE.search(html)
+    return match.group(1).replace("\\/", "/") if match else None
+
+
+def _find_iframe_video(soup):
+    for iframe in soup.find_all("iframe"):
+        src = str(iframe.get("src", ""))
+        if "youtube" in src or "youtu.be" in src:
+            vid = get_video_id_from_url(src)
+            if vid:
+                return vid
+    return None
+
+
+def parse_substack_content(url):
+    page = extract_post(url)
+    return page.blocks, page.youtube_id
 
 
 def get_substack_cover_image(url):
+    """The post's og:image (or twitter:image) URL.
+
+    Only the <head> is downloaded: reading stops at </head>, or as soon as
+    an og:image or twitter:image tag has arrived (og:image still wins when
+    both are in what was read). Pages already in the HTTP cache are
+    revalidated instead, which usually costs a 304.
+    """
     if not url:
         return None
-    headers = config.BROWSER_HEADERS.copy()
-    if config.SUBSTACK_COOKIE:
-        headers["Cookie"] = config.SUBSTACK_COOKIE
+    if http_cache.is_cached(url, cookie=True):
+        return extract_post(url, parts=(COVER,)).cover_url
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return None
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        og_image = soup.find("meta", property="og:image")
-        if og_image and og_image.get("content"):
-            return og_image["content"]
-
-        twitter_img = soup.find("meta", attrs={"name": "twitter:image"})
-        if twitter_img and twitter_img.get("content"):
-            return twitter_img["content"]
+        with metrics.stage("scrape"):
+            response, head = http_client.get_prefix(url, COVER_READ_END_RE.search, cookie=True)
     except Exception as e:
-        log.error(f"Cover scrape error: {e}")
-    return None
+        log.error(f"Scrape error for {url}: {e}")
+        return None
+    if response.status_code != 200:
+        log.error(f"Scrape error for {url}: status {response.status_code}")
+        return None
+    return parse_post_html(head.decode(response.encoding or "utf-8", errors="replace"), parts=(COVER,)).cover_url
 
 
 def find_video_on_substack_page(url):
+    """(kind, data) for the post's video, or (None, None) if the page has
+    none. Raises if the page could not be fetched, so callers can tell a
+    failed lookup from a post without a video."""
     log.info("Visiting Substack page for video detection...")
-    headers = config.BROWSER_HEADERS.copy()
-    if config.SUBSTACK_COOKIE:
-        headers["Cookie"] = config.SUBSTACK_COOKIE
-
-    try:
-        response = requests.get(url, headers=headers)
-        html = response.text
-
-        # Check for native VTT
-        vtt_matches = re.findall(r"(https:[^\"']+\.vtt)", html)
-        if not vtt_matches:
-            vtt_matches = re.findall(r"(https:\\/\\/[^\"']+\.vtt)", html)
-        if vtt_matches:
-            vtt_url = vtt_matches[0].replace("\\/", "/")
-            log.info("Found hidden VTT URL.")
-            return "native_vtt", vtt_url
-
-        # Check for YouTube embeds
-        soup = BeautifulSoup(html, "html.parser")
-        for iframe in soup.find_all("iframe"):
-            src = str(iframe.get("src", ""))
-            if "youtube" in src or "youtu.be" in src:
-                vid = get_video_id_from_url(src)
-                if vid:
-                    return "youtube", vid
-
-    except Exception as e:
-        log.error(f"Error scraping page: {e}")
-    return None, None
+    vid_type, vid_data = _fetch_post(url, (VIDEO,)).video()
+    if vid_type == "native_vtt":
+        log.info("Found hidden VTT URL.")
+    return vid_type, vid_data
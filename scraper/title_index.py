@@ -0,0 +1,200 @@
+"""Near-duplicate lookup over normalized titles without scanning every title.
+
+The rules are the ones `utils.is_duplicate` has always applied to a plain set:
+an exact match, either title containing the other when the contained one is
+longer than 30 chars, or a SequenceMatcher ratio above 0.92 against an
+existing title longer than 10 chars. The index only narrows down which
+existing titles are worth checking; every hit is still confirmed with the
+original test, and the pruning bounds never drop a title that would match.
+"""
+
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+GRAM_SIZE = 4
+CONTAINMENT_MIN_LEN = 31
+RATIO_THRESHOLD = 0.92
+RATIO_MIN_LEN = 11
+
+
+def _grams(text):
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _max_distance(len_a, len_b):
+    # Largest insert/delete distance between two titles whose SequenceMatcher
+    # ratio can still clear the threshold: the ratio is 2M / (len_a + len_b)
+    # for M matched characters, and the distance is len_a + len_b - 2M.
+    total = len_a + len_b
+    matches = int(total * RATIO_THRESHOLD / 2)
+    while 2.0 * matches / total <= RATIO_THRESHOLD:
+        matches += 1
+    return total - 2 * matches
+
+
+def _ratio_lengths(length):
+    # Existing-title lengths that can reach the ratio threshold at all:
+    # the ratio never exceeds 2 * min(len) / (len_a + len_b).
+    low = max(RATIO_MIN_LEN, int(length * RATIO_THRESHOLD / (2 - RATIO_THRESHOLD)))
+    high = int(length * (2 - RATIO_THRESHOLD) / RATIO_THRESHOLD) + 1
+    return [n for n in range(low, high + 1) if 2 * min(length, n) / (length + n) > RATIO_THRESHOLD]
+
+
+def _bigram_windows(text, distance):
+    # text's bigrams with the start and end of where each may sit in a
+    # title `distance` edits away, as argument lists for str.find.
+    positions = range(len(text) - 1)
+    return (
+        [text[i : i + 2] for i in positions],
+        [max(0, i - distance) for i in positions],
+        [i + distance + 2 for i in positions],
+    )
+
+class TitleIndex:
+    """Set of normalized titles that answers `is_duplicate` in sub-linear time.
+
+    Supports the parts of the set API the tasks use (`in`, `len`, iteration,
+    `add`, `discard`), so it can stand in for the set of existing titles.
+    """
+
+    def __init__(self, titles=()):
+        self._titles = {}
+        self._ids = {}
+        self._postings = defaultdict(lambda: defaultdict(set))
+        self._by_length = defaultdict(set)
+        self._prefixes = defaultdict(set)
+        self._next_id = 0
+        for title in titles:
+            self.add(title)
+
+    def __contains__(self, title):
+        return title in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def add(self, title):
+        if not title or title in self._ids:
+            return
+        tid = self._next_id
+        self._next_id += 1
+        self._titles[tid] = title
+        self._ids[title] = tid
+
+        for gram in _grams(title):
+            self._postings[gram][len(title)].add(tid)
+        self._by_length[len(title)].add(tid)
+        if len(title) >= CONTAINMENT_MIN_LEN:
+            self._prefixes[title[:CONTAINMENT_MIN_LEN]].add(tid)
+
+    def discard(self, title):
+        tid = self._ids.pop(title, None)
+        if tid is None:
+            return
+        del self._titles[tid]
+        for gram in _grams(title):
+            by_length = self._postings[gram]
+            by_length[len(title)].discard(tid)
+            if not by_length[len(title)]:
+                del by_length[len(title)]
+            if not by_length:
+                del self._postings[gram]
+        self._by_length[len(title)].discard(tid)
+        if len(title) >= CONTAINMENT_MIN_LEN:
+            self._prefixes[title[:CONTAINMENT_MIN_LEN]].discard(tid)
+
+    def find_duplicate(self, new_norm):
+        """Returns the existing title that new_norm duplicates, or None."""
+        if new_norm in self._ids:
+            return new_norm
+        return (
+            self._find_contained(new_norm)
+            or self._find_containing(new_norm)
+            or self._find_similar(new_norm)
+        )
+
+    def _postings_at_least(self, gram, length):
+        by_length = self._postings.get(gram, {})
+        return [ids for n, ids in by_length.items() if n >= length]
+
+    def _find_contained(self, new_norm):
+        # An existing long title inside new_norm starts at some offset of
+        # new_norm, so its fixed-length prefix is one of new_norm's windows.
+        for i in range(len(new_norm) - CONTAINMENT_MIN_LEN + 1):
+            for tid in self._prefixes.get(new_norm[i : i + CONTAINMENT_MIN_LEN], ()):
+                if self._titles[tid] in new_norm:
+                    return self._titles[tid]
+        return None
+
+    def _find_containing(self, new_norm):
+        # A title containing new_norm contains all of its grams, including
+        # the rarest one, so that gram's postings are the only candidates.
+        if len(new_norm) < CONTAINMENT_MIN_LEN:
+            return None
+        rarest = min(
+            _grams(new_norm),
+            key=lambda g: sum(len(ids) for ids in self._postings_at_least(g, len(new_norm))),
+        )
+        for ids in self._postings_at_least(rarest, len(new_norm)):
+            for tid in ids:
+                if new_norm in self._titles[tid]:
+                    return self._titles[tid]
+        return None
+
+    def _find_similar(self, new_norm):
+        # quick_ratio() is symmetric and bounds ratio() from above, so the
+        # cheap check can keep new_norm as the analysed side; the real ratio
+        # is computed with the same argument order is_duplicate always used.
+        bound = SequenceMatcher(None, "", new_norm)
+        for length in _ratio_lengths(len(new_norm)):
+            for tid in self._similar_candidates(new_norm, length):
+                existing = self._titles[tid]
+                bound.set_seq1(existing)
+                if bound.quick_ratio() <= RATIO_THRESHOLD:
+                    continue
+                if SequenceMatcher(None, new_norm, existing).ratio() > RATIO_THRESHOLD:
+                    return existing
+        return None
+
+    def _similar_candidates(self, new_norm, length):
+        # Above the threshold new_norm turns into the existing title with at
+        # most `distance` inserts/deletes, and each of those breaks at most
+        # one of a set of non-overlapping grams. So out of new_norm cut into
+        # consecutive grams, every possible match still contains all but
+        # `distance` of them verbatim, and so at least one of the rarest
+        # distance + 1. Only titles in those postings are counted.
+        distance = _max_distance(len(new_norm), length)
+        best = None
+        for offset in range(GRAM_SIZE):
+            grams = [new_norm[i : i + GRAM_SIZE] for i in range(offset, len(new_norm) - GRAM_SIZE + 1, GRAM_SIZE)]
+            if len(grams) <= distance:
+                continue
+            postings = sorted((self._postings.get(gram, {}).get(length, ()) for gram in grams), key=len)
+            cost = sum(map(len, postings[: distance + 1]))
+            if best is None or cost < best[0]:
+                best = (cost, postings)
+        if best is None:
+            return self._by_length.get(length, ())
+
+        postings = best[1]
+        candidates = set().union(*postings[: distance + 1])
+        if not candidates:
+            return ()
+        hits = Counter()
+        for ids in postings:
+            hits.update(candidates.intersection(ids))
+        candidates = [tid for tid, count in hits.items() if count >= len(postings) - distance]
+
+        # Each edit also breaks at most two of new_norm's overlapping
+        # bigrams and moves the ones after it by one place, so a match still
+        # holds all but 2 * distance of them within `distance` of their own
+        # position. That leaves SequenceMatcher a handful of titles to check.
+        if candidates and len(new_norm) - 1 > 2 * distance:
+            windows = _bigram_windows(new_norm, distance)
+            candidates = [
+                tid for tid in candidates if list(map(self._titles[tid].find, *windows)).count(-1) <= 2 * distance
+            ]
+        return candidates
@@ -0,0 +1,110 @@
+"""Persistent cache of transcripts, so each video costs one API call ever.
+
+Entries are keyed by YouTube video id ("yt:<id>") or, for native Substack
+video, by a hash of the VTT URL ("vtt:<sha256>"). Text is stored
+zlib-compressed in a small SQLite file at TRANSCRIPT_CACHE_PATH (set it
+empty to disable). "No transcript" answers are cached too, but only for
+TRANSCRIPT_NEGATIVE_TTL_HOURS, since captions often appear later.
+Least recently used entries are evicted past TRANSCRIPT_CACHE_MAX_MB.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from scraper import config, metrics
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    key TEXT PRIMARY KEY,
+    body BLOB,
+    size INTEGER NOT NULL,
+    expires_at REAL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_used_at ON transcripts (used_at);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(config.TRANSCRIPT_CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(config.TRANSCRIPT_CACHE_PATH, check_same_thread=False)
+        _conn.executescript(SCHEMA)
+    return _conn
+
+
+def video_key(video_id):
+    return f"yt:{video_id}"
+
+
+def vtt_key(vtt_url):
+    return "vtt:" + hashlib.sha256(vtt_url.encode()).hexdigest()
+
+
+def get(key):
+    """The cached transcript, "" for a cached miss, or None if unknown."""
+    if not config.TRANSCRIPT_CACHE_PATH or not key:
+        return None
+    now = time.time()
+    try:
+        with _lock:
+            db = _db()
+            row = db.execute("SELECT body, expires_at FROM transcripts WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                metrics.incr("transcript_cache_misses")
+                return None
+            db.execute("UPDATE transcripts SET used_at = ? WHERE key = ?", (now, key))
+            db.commit()
+    except sqlite3.Error as e:
+        log.warning(f"Transcript cache read failed: {e}")
+        return None
+    metrics.incr("transcript_cache_hits")
+    return zlib.decompress(row[0]).decode() if row[0] else ""
+
+
+def put(key, text):
+    """Stores a transcript; an empty one is remembered as a miss for a while."""
+    if not config.TRANSCRIPT_CACHE_PATH or not key:
+        return
+    now = time.time()
+    body = zlib.compress(text.encode(), 6) if text else None
+    expires_at = None if text else now + config.TRANSCRIPT_NEGATIVE_TTL_HOURS * 3600
+    try:
+        with _lock:
+            db = _db()
+            db.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?)",
+                (key, body, len(body or b""), expires_at, now),
+            )
+            _evict(db, now)
+            db.commit()
+    except sqlite3.Error as e:
+        log.warning(f"Transcript cache write failed: {e}")
+
+
+def _evict(db, now):
+    db.execute("DELETE FROM transcripts WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+    excess = db.execute("SELECT COALESCE(SUM(size), 0) FROM transcripts").fetchone()[0] - config.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+    if excess <= 0:
+        return
+    freed = 0
+    doomed = []
+    for key, size in db.execute("SELECT key, size FROM transcripts ORDER BY used_at"):
+        if freed >= excess:
+            break
+        doomed.append((key,))
+        freed += size
+    db.executemany("DELETE FROM transcripts WHERE key = ?", doomed)
@@ -3,17 +3,26 @@ import time
 from datetime import datetime
 from difflib import SequenceMatcher
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from scraper import config
+from scraper.title_index import TitleIndex
 
+# Notion's per-block limits: characters per rich_text segment, segments per block
+TEXT_LIMIT = 2000
+SEGMENTS_PER_BLOCK = 100
 
-def get_resilient_session():
-    session = requests.Session()
-    retry = Retry(total=3, read=3, connect=3, backoff_factor=2, status_forcelist=[500, 502, 503, 504, 429])
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("https://", adapter)
-    return session
+
+# Words too common in titles to tell two posts or videos apart.
+STOP_WORDS = {
+    "a", "about", "an", "and", "are", "been", "but", "can", "does", "for", "from", "have", "how", "i",
+    "in", "into", "is", "it", "its", "more", "not", "of", "on", "or", "our", "than", "that", "the",
+    "their", "them", "then", "there", "these", "they", "this", "to", "was", "were", "what", "when",
+    "where", "which", "who", "why", "will", "with", "you", "your",
+}
+
+
+def title_words(text):
+    """The distinctive lower-case words of a title (stop words removed)."""
+    return {t for t in re.findall(r"[a-z0-9]+", str(text).lower()) if t not in STOP_WORDS}
 
 
 def normalize_title(text):
@@ -26,6 +35,9 @@ def normalize_title(text):
 def is_duplicate(new_title, existing_titles_norm):
     new_norm = normalize_title(new_title)
 
+    if isinstance(existing_titles_norm, TitleIndex):
+        return existing_titles_norm.find_duplicate(new_norm) is not None
+
     if new_norm in existing_titles_norm:
         return True
 
@@ -98,6 +110,53 @@ def text_to_blocks_simple(text):
     return blocks
 
 
+def split_text(text, limit=TEXT_LIMIT):
+    """Cuts text into pieces of at most limit characters as Notion counts
+    them (UTF-16 units, so characters outside the BMP count twice)."""
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + limit)
+        while True:
+            units = len(text[start:end].encode("utf-16-le")) // 2
+            if units <= limit:
+                break
+            end -= max(1, (units - limit) // 2)
+        yield text[start:end]
+        start = end
+
+
+def text_to_dense_blocks(text, split_paragraphs=False):
+    """Packs text into as few paragraph blocks as Notion allows: up to
+    SEGMENTS_PER_BLOCK rich_text segments of TEXT_LIMIT characters each.
+
+    Paragraph breaks stay in the text unless split_paragraphs is set, in
+    which case every paragraph starts a new block.
+    """
+    blocks = []
+    if not text:
+        return blocks
+    text = text.replace("\r", "")
+    parts = text.split("\n\n") if split_paragraphs else [text]
+    for part in parts:
+        segments = list(split_text(part.strip()))
+        for i in range(0, len(segments), SEGMENTS_PER_BLOCK):
+            blocks.append({
+                "object": "block",
+                "type": "paragraph",
+                "paragraph": {
+                    "rich_text": [{"type": "text", "text": {"content": s}} for s in segments[i : i + SEGMENTS_PER_BLOCK]]
+                },
+            })
+    return blocks
+
+
+def transcript_to_blocks(text):
+    """Transcript blocks in the layout chosen by TRANSCRIPT_LAYOUT."""
+    if config.TRANSCRIPT_LAYOUT == "paragraphs":
+        return text_to_blocks_simple(text)
+    return text_to_dense_blocks(text, split_paragraphs=config.TRANSCRIPT_SECTION_MINUTES > 0)
+
+
 def _paragraph_block(text):
     return {
         "object": "block",
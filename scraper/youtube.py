@@ -1,67 +1,205 @@
+import json
 import logging
+import os
+import re
+import threading
+from collections import defaultdict, namedtuple
+from difflib import SequenceMatcher
 
 import feedparser
 
-from scraper import config
-from scraper.utils import fuzzy_match, get_resilient_session, get_video_id_from_url
+from scraper import config, http_cache, http_client, metrics, transcript_cache
+from scraper.utils import get_video_id_from_url, title_words
 
 log = logging.getLogger(__name__)
 
 
+class VideoCatalog:
+    """Channel videos indexed by title, newest first.
+
+    match() applies the same rules as before (any exact substring match in
+    either direction wins, otherwise the best fuzzy score above 0.70) and
+    gives the same answer. Videos sharing a word with the post title are
+    scored first; the rest are only scored when SequenceMatcher's cheap
+    upper bounds say they could still beat the best score so far.
+    """
+
+    def __init__(self, videos=()):
+        self.videos = []
+        self._links = set()
+        self._by_token = defaultdict(list)
+        for title, link in videos:
+            self.add(title, link)
+
+    def add(self, title, link):
+        if not title or not link or link in self._links:
+            return
+        vid = len(self.videos)
+        self.videos.append((title, link, title.lower()))
+        self._links.add(link)
+        for token in title_words(title):
+            self._by_token[token].append(vid)
+
+    def match(self, substack_title):
+        clean_substack = substack_title.lower().strip()
+
+        # Exact substring match first
+        for title, link, lower in self.videos:
+            if clean_substack in lower or lower in clean_substack:
+                log.info(f"Exact match found: '{title}'")
+                return link
+
+        shared = {vid for token in title_words(substack_title) for vid in self._by_token.get(token, ())}
+        order = sorted(shared) + [vid for vid in range(len(self.videos)) if vid not in shared]
+        lower_substack = substack_title.lower()
+        best_vid = None
+        highest_score = 0
+        for vid in order:
+            matcher = SequenceMatcher(None, lower_substack, self.videos[vid][2])
+            if vid not in shared:
+                # Below 0.50 a video can neither match nor be logged as weak.
+                floor = max(highest_score, 0.50)
+                if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                    continue
+            score = matcher.ratio()
+            # Ties go to the earlier (newer) video, as in a plain scan.
+            if score > highest_score or (score == highest_score and best_vid is not None and vid < best_vid):
+                highest_score = score
+                best_vid = vid
+        best_match = self.videos[best_vid] if best_vid is not None else None
+
+        if highest_score > 0.70 and best_match:
+            log.info(f"Close match found: '{best_match[0]}' ({highest_score:.2f})")
+            return best_match[1]
+
+        if highest_score > 0.50 and best_match:
+            log.info(f"Weak match (skipping): '{best_match[0]}' ({highest_score:.2f})")
+
+        return None
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _load_saved_videos():
+    try:
+        with open(config.YOUTUBE_CATALOG_PATH) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if saved.get("channel_id") != config.YOUTUBE_CHANNEL_ID:
+        return []
+    return [(v["title"], v["link"]) for v in saved.get("videos", [])]
+
+
+def _save_videos(catalog):
+    try:
+        directory = os.path.dirname(config.YOUTUBE_CATALOG_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(config.YOUTUBE_CATALOG_PATH, "w") as f:
+            json.dump({
+                "channel_id": config.YOUTUBE_CHANNEL_ID,
+                "videos": [{"title": title, "link": link} for title, link, _ in catalog.videos],
+            }, f)
+    except OSError as e:
+        log.warning(f"Could not save YouTube catalog: {e}")
+
+
+def get_channel_catalog():
+    """Loads the channel feed once per process, merged with earlier runs.
+
+    The feed only lists the latest videos, so videos seen on previous runs
+    are kept in YOUTUBE_CATALOG_PATH (set it empty to disable).
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is not None:
+            return _catalog
+
+        log.info("Loading YouTube channel feed...")
+        youtube_rss = f"{config.YOUTUBE_FEED_URL}?channel_id={config.YOUTUBE_CHANNEL_ID}"
+        try:
+            response = http_cache.get(youtube_rss)
+            feed = feedparser.parse(response.content, response_headers=http_cache.feed_headers(response))
+            entries = feed.entries
+        except Exception as e:
+            log.error(f"YouTube RSS error: {e}")
+            entries = []
+
+        catalog = VideoCatalog((entry.title, entry.link) for entry in entries)
+        if config.YOUTUBE_CATALOG_PATH:
+            for title, link in _load_saved_videos():
+                catalog.add(title, link)
+            if entries:
+                _save_videos(catalog)
+
+        log.info(f"YouTube catalog: {len(catalog.videos)} videos.")
+        _catalog = catalog
+        return _catalog
+
+
+@metrics.timed("video_match")
 def find_matching_video_rss(substack_title):
     if not config.YOUTUBE_CHANNEL_ID:
         return None
 
     log.info("Checking YouTube RSS for match...")
-    youtube_rss = f"https://www.youtube.com/feeds/videos.xml?channel_id={config.YOUTUBE_CHANNEL_ID}"
-    feed = feedparser.parse(youtube_rss)
-
-    best_match = None
-    highest_score = 0
-    clean_substack = substack_title.lower().strip()
-
-    for entry in feed.entries[:100]:
-        # Exact substring match first
-        if clean_substack in entry.title.lower() or entry.title.lower() in clean_substack:
-            log.info(f"Exact match found: '{entry.title}'")
-            return entry.link
+    return get_channel_catalog().match(substack_title)
 
-        score = fuzzy_match(substack_title, entry.title)
-        if score > highest_score:
-            highest_score = score
-            best_match = entry
 
-    if highest_score > 0.70 and best_match:
-        log.info(f"Close match found: '{best_match.title}' ({highest_score:.2f})")
-        return best_match.link
+# One caption: start/end in seconds (None when unknown) and its text.
+Cue = namedtuple("Cue", "start end text")
 
-    if highest_score > 0.50 and best_match:
-        log.info(f"Weak match (skipping): '{best_match.title}' ({highest_score:.2f})")
 
-    return None
+def _join_transcript(cues):
+    """Joins caption cues into transcript text; with TRANSCRIPT_SECTION_MINUTES
+    set and start times present, a blank line marks every N-minute boundary."""
+    section = config.TRANSCRIPT_SECTION_MINUTES * 60
+    parts = []
+    boundary = section
+    for cue in cues:
+        if section and parts and isinstance(cue.start, (int, float)) and cue.start >= boundary:
+            parts.append("\n\n")
+            while boundary <= cue.start:
+                boundary += section
+        elif parts:
+            parts.append(" ")
+        parts.append(cue.text)
+    return "".join(parts).replace("  ", " ").strip()
 
 
+@metrics.timed("transcript")
 def get_transcript_from_api(video_url):
     if not config.TRANSCRIPT_API_KEY:
         return ""
     if not video_url or "youtube" not in str(video_url):
         return ""
 
+    video_id = get_video_id_from_url(video_url)
+    key = transcript_cache.video_key(video_id) if video_id else None
+    cached = transcript_cache.get(key)
+    if cached is not None:
+        log.info(f"Transcript cached for: {video_url} ({len(cached)} chars)")
+        return cached
+
     log.info(f"Fetching transcript for: {video_url}")
-    session = get_resilient_session()
     try:
-        response = session.get(
-            "https://transcriptapi.com/api/v2/youtube/transcript",
-            headers={"Authorization": f"Bearer {config.TRANSCRIPT_API_KEY}"},
+        response = http_client.get(
+            config.TRANSCRIPT_API_URL,
             params={"video_url": video_url, "format": "json"},
         )
         if response.status_code == 200:
             data = response.json()
+            full_text = ""
             if "transcript" in data:
-                full_text = " ".join([item["text"] for item in data["transcript"]])
-                full_text = full_text.replace("  ", " ").strip()
+                full_text = _join_transcript(Cue(item.get("start"), None, item["text"]) for item in data["transcript"])
                 log.info(f"Transcript found ({len(full_text)} chars)")
-                return full_text
+            transcript_cache.put(key, full_text)
+            return full_text
+        if response.status_code == 404:
+            transcript_cache.put(key, "")
     except Exception as e:
         log.error(f"Transcript API error: {e}")
     return ""
@@ -72,33 +210,75 @@ def get_transcript_from_video_id(video_id):
     return get_transcript_from_api(video_url)
 
 
-def clean_vtt(text):
-    lines = text.split("\n")
-    unique_lines = []
+VTT_TIME_RE = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})")
+
+
+def _vtt_seconds(stamp):
+    match = VTT_TIME_RE.match(stamp.strip())
+    if not match:
+        return None
+    hours, minutes, seconds, fraction = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction.ljust(3, "0")) / 1000
+
+
+def parse_vtt(lines):
+    """Yields a Cue per caption from VTT lines, as they are read.
+
+    Rolling captions repeat the previous cue's last line at the top of the
+    next one; a line equal to the line before it is dropped, so joining the
+    cues' text gives each line once.
+    """
+    start = end = None
+    cue = []
     last = ""
     for line in lines:
-        if "-->" in line or line.strip() == "" or line.strip().isdigit() or "WEBVTT" in line:
+        if "-->" in line:
+            if cue:
+                yield Cue(start, end, " ".join(cue))
+                cue = []
+            left, _, right = line.partition("-->")
+            start, end = _vtt_seconds(left), _vtt_seconds(right)
             continue
         clean = line.strip()
+        if not clean or clean.isdigit() or "WEBVTT" in line:
+            continue
         if clean != last:
-            unique_lines.append(clean)
+            cue.append(clean)
         last = clean
-    return " ".join(unique_lines)
+    if cue:
+        yield Cue(start, end, " ".join(cue))
+
+
+def clean_vtt(text):
+    return " ".join(cue.text for cue in parse_vtt(text.split("\n")))
 
 
+@metrics.timed("transcript")
 def get_transcript_from_vtt_url(vtt_url):
+    """The transcript of a native Substack video. The VTT file is parsed
+    while it downloads and never held in memory whole.
+
+    Returns "" when the video definitely has no captions (404/410, or an
+    empty file) and None when the download failed and is worth retrying.
+    """
+    key = transcript_cache.vtt_key(vtt_url)
+    cached = transcript_cache.get(key)
+    if cached is not None:
+        log.info(f"VTT transcript cached ({len(cached)} chars)")
+        return cached
+
     log.info("Downloading VTT file...")
-    headers = config.BROWSER_HEADERS.copy()
-    if config.SUBSTACK_COOKIE:
-        headers["Cookie"] = config.SUBSTACK_COOKIE
     try:
-        import requests
-
-        resp = requests.get(vtt_url, headers=headers)
+        resp = http_client.get(vtt_url, cookie=True, stream=True)
         if resp.status_code == 200:
-            return clean_vtt(resp.text)
-        else:
-            log.error(f"VTT download failed: status {resp.status_code}")
+            text = _join_transcript(parse_vtt(http_client.iter_lines(resp)))
+            transcript_cache.put(key, text)
+            return text
+        resp.close()
+        log.error(f"VTT download failed: status {resp.status_code}")
+        if resp.status_code in (404, 410):
+            transcript_cache.put(key, "")
+            return ""
     except Exception as e:
         log.error(f"VTT network error: {e}")
-    return ""
+    return None
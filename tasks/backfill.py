@@ -1,72 +1,163 @@
+import json
 import logging
-import time
 from datetime import datetime
 
-from scraper import notion_client, substack, youtube
-from scraper.utils import is_duplicate, normalize_title
+from scraper import config, notion_client, state, substack, youtube
+from scraper.pipeline import ImportPipeline
+from scraper.title_index import TitleIndex
 
 log = logging.getLogger(__name__)
 
 
-def run():
+def scrape_post(title, url, date_str):
+    page = substack.extract_post(url)
+    content_blocks, embedded_yt_id = page.blocks, page.youtube_id
+
+    yt_url = None
+    transcript = ""
+
+    if embedded_yt_id:
+        yt_url = f"https://www.youtube.com/watch?v={embedded_yt_id}"
+    else:
+        yt_url = youtube.find_matching_video_rss(title)
+
+    if yt_url:
+        transcript = youtube.get_transcript_from_api(yt_url)
+
+    return {
+        "title": title,
+        "date": date_str,
+        "url": url,
+        "content_blocks": content_blocks,
+        "transcript": transcript,
+        "yt_url": yt_url,
+        "cover": page.cover_url,
+    }
+
+
+def import_post(post_id):
+    """Takes one journaled post as far as it will go, checkpointing each step."""
+    row = state.journal_get(post_id)
+
+    if row["data"]:
+        data = json.loads(row["data"])
+    else:
+        data = scrape_post(row["title"], row["url"], row["date"])
+        state.journal_update(post_id, status="scraped", data=json.dumps(data))
+
+    children = notion_client.page_children(data)
+    page_id, written = row["page_id"], row["appended"]
+    if not page_id:
+        page_id, written = notion_client.create_page(data, children)
+        if not page_id:
+            return False
+        state.journal_update(post_id, status="page_created", page_id=page_id, appended=written)
+
+    appended = notion_client.append_children(
+        page_id, children, start=written,
+        on_batch=lambda count: state.journal_update(post_id, appended=count),
+    )
+    if appended < len(children):
+        # The page exists, so the title stays taken; --resume finishes it.
+        log.warning(f"  Partially imported ({appended}/{len(children)} blocks): {row['title'][:60]}")
+        return True
+    state.journal_update(post_id, status="children_appended")
+
+    state.journal_update(post_id, status="done", data=None)
+    log.info(f"  Imported: {row['title'][:60]}")
+    return True
+
+
+def _journal_post(post):
+    title = post.get("title", "").strip()
+    if not title:
+        return None
+    slug = post.get("slug", "")
+    canonical_url = post.get("canonical_url", "")
+    url = canonical_url or slug
+    post_date = post.get("post_date", "")
+
+    # Parse date
+    try:
+        dt = datetime.fromisoformat(post_date.replace("Z", "+00:00"))
+        date_str = dt.strftime("%Y-%m-%d")
+    except Exception:
+        date_str = datetime.now().strftime("%Y-%m-%d")
+
+    return state.journal_add(str(post.get("id") or url), title, url, date_str)
+
+
+def run(new_only=False, resume=False):
+    """Imports the archive. With new_only, stops once it reaches a run of
+    ARCHIVE_STOP_AFTER_KNOWN posts that are already in Notion.
+
+    Progress is journaled per post. With resume, unfinished posts from the
+    previous run are picked up where they stopped and the archive walk
+    continues from where it got to, instead of starting over.
+    """
     log.info("--- Starting full backfill ---")
 
-    existing_titles = notion_client.get_all_notion_titles()
-    all_posts = substack.fetch_full_archive()
+    if not resume:
+        state.journal_reset()
 
-    new_count = 0
-    skip_count = 0
-
-    for post in all_posts:
-        title = post.get("title", "").strip()
-        slug = post.get("slug", "")
-        canonical_url = post.get("canonical_url", "")
-        url = canonical_url or slug
-        post_date = post.get("post_date", "")
-
-        if not title:
-            continue
-
-        if is_duplicate(title, existing_titles):
-            skip_count += 1
-            continue
-
-        # Parse date
-        try:
-            dt = datetime.fromisoformat(post_date.replace("Z", "+00:00"))
-            date_str = dt.strftime("%Y-%m-%d")
-        except Exception:
-            date_str = datetime.now().strftime("%Y-%m-%d")
-
-        log.info(f"Importing: {title[:60]}...")
-        new_count += 1
-
-        content_blocks, embedded_yt_id = substack.parse_substack_content(url)
+    state.refresh()
+    existing_titles = TitleIndex(state.existing_titles())
 
-        yt_url = None
-        transcript = ""
-
-        if embedded_yt_id:
-            yt_url = f"https://www.youtube.com/watch?v={embedded_yt_id}"
+    skip_count = 0
+    known_streak = 0
+    queued = set()
+    walk_error = None
+
+    def queue(pipeline, row):
+        queued.add(row["post_id"])
+        if row["page_id"]:
+            pipeline.resume(row["title"], import_post, row["post_id"])
+            return True
+        if pipeline.submit(row["title"], import_post, row["post_id"]):
+            return True
+        state.journal_update(row["post_id"], status="skipped", data=None)
+        return False
+
+    with ImportPipeline(existing_titles) as pipeline:
+        if resume:
+            unfinished = state.journal_unfinished()
+            log.info(f"Resuming {len(unfinished)} unfinished posts from the journal.")
+            for row in unfinished:
+                if not queue(pipeline, row):
+                    skip_count += 1
+
+        if resume and state.get_meta("backfill_archive_complete"):
+            log.info("Archive already walked, nothing left to fetch.")
         else:
-            yt_url = youtube.find_matching_video_rss(title)
-
-        if yt_url:
-            transcript = youtube.get_transcript_from_api(yt_url)
-
-        success = notion_client.create_notion_page({
-            "title": title,
-            "date": date_str,
-            "url": url,
-            "content_blocks": content_blocks,
-            "transcript": transcript,
-            "yt_url": yt_url,
-        })
-
-        if success:
-            log.info(f"  Imported ({new_count}).")
-            existing_titles.add(normalize_title(title))
-
-        time.sleep(2)
-
-    log.info(f"Backfill complete. Imported {new_count} new posts, skipped {skip_count} duplicates.")
+            archive = substack.iter_archive(start=state.journal_count() if resume else 0)
+            try:
+                for post in archive:
+                    row = _journal_post(post)
+                    if row is None or row["post_id"] in queued or row["status"] in state.JOURNAL_FINISHED:
+                        continue
+
+                    if not queue(pipeline, row):
+                        skip_count += 1
+                        known_streak += 1
+                        if new_only and known_streak >= config.ARCHIVE_STOP_AFTER_KNOWN:
+                            log.info("Reached posts already in Notion, stopping early.")
+                            archive.close()
+                            break
+                        continue
+                    known_streak = 0
+
+                    log.info(f"Importing: {row['title'][:60]}...")
+                else:
+                    # Only a walk that reached the end may skip the archive on --resume.
+                    state.set_meta("backfill_archive_complete", "1")
+            except Exception as e:
+                # Let the queued posts finish first; they are journaled either way.
+                log.error(f"Archive walk stopped early, --resume will continue it: {e}")
+                walk_error = e
+
+    log.info(
+        f"Backfill complete. Imported {pipeline.imported} new posts "
+        f"({pipeline.failed} failed), skipped {skip_count} duplicates."
+    )
+    if walk_error:
+        raise walk_error
@@ -1,70 +1,91 @@
 import logging
-import time
 
-from scraper import notion_client, substack, youtube
-from scraper.utils import fix_date_iso, is_duplicate, normalize_title
+from scraper import config, notion_client, state, substack, youtube
+from scraper.pipeline import ImportPipeline
+from scraper.title_index import TitleIndex
+from scraper.utils import fix_date_iso
 
 log = logging.getLogger(__name__)
 
 
-def run():
-    log.info("--- Starting daily sync ---")
-
-    existing_titles = notion_client.get_all_notion_titles()
-    entries = substack.fetch_rss_entries()
+def import_entry(title, link, pub_date):
+    page = substack.extract_post(link)
+    content_blocks, embedded_yt_id = page.blocks, page.youtube_id
 
-    new_posts_count = 0
-
-    for entry in entries:
-        title = entry.title.strip()
-        link = entry.link.split("?")[0]
-        pub_date = fix_date_iso(entry.published_parsed)
+    yt_url = None
+    transcript = ""
 
-        if is_duplicate(title, existing_titles):
-            log.info(f"Skipping (already in DB): {title[:30]}...")
-            continue
-
-        log.info(f"New post found: {title}")
-        new_posts_count += 1
+    if embedded_yt_id:
+        log.info(f"Found embedded video ID: {embedded_yt_id}")
+        yt_url = f"https://www.youtube.com/watch?v={embedded_yt_id}"
+    else:
+        log.info("No embedded video, checking YouTube RSS...")
+        yt_url = youtube.find_matching_video_rss(title)
 
-        content_blocks, embedded_yt_id = substack.parse_substack_content(link)
+    if yt_url:
+        transcript = youtube.get_transcript_from_api(yt_url)
+    else:
+        log.info("No YouTube video found for this post.")
+
+    success = notion_client.create_notion_page({
+        "title": title,
+        "date": pub_date,
+        "url": link,
+        "content_blocks": content_blocks,
+        "transcript": transcript,
+        "yt_url": yt_url,
+        "cover": page.cover_url,
+    })
+
+    if success:
+        log.info(f"Successfully imported to Notion: {title[:30]}...")
+    return success
+
+
+def load_existing_titles(posts):
+    """Titles to dedupe posts against, fetched the cheapest way.
+
+    A warm store only needs an incremental refresh. Otherwise rebuilding it
+    costs a query per 100 pages, against one (concurrent) query per post,
+    so small batches are looked up directly and the rebuild is left to the
+    next task that needs the store. A post that matches more than one page
+    of results makes the lookup give up, so it never costs more than that.
+    """
+    known = state.count_pages()
+    if not state.is_warm() and len(posts) <= config.LOOKUP_MAX_POSTS and (not known or len(posts) < known / 100):
+        log.info(f"Looking up {len(posts)} posts in Notion...")
+        try:
+            titles = notion_client.lookup_titles([(title, link) for title, link, _ in posts])
+            if titles is not None:
+                log.info(f"Found {len(titles)} possibly matching pages.")
+                return TitleIndex(titles)
+            log.info("A title is too generic to look up, reading all titles instead.")
+        except Exception as e:
+            log.warning(f"Lookup failed, falling back to a full refresh: {e}")
+
+    state.refresh()
+    return TitleIndex(state.existing_titles())
 
-        yt_url = None
-        transcript = ""
 
-        if embedded_yt_id:
-            log.info(f"Found embedded video ID: {embedded_yt_id}")
-            yt_url = f"https://www.youtube.com/watch?v={embedded_yt_id}"
-        else:
-            log.info("No embedded video, checking YouTube RSS...")
-            yt_url = youtube.find_matching_video_rss(title)
+def run():
+    log.info("--- Starting daily sync ---")
 
-        if yt_url:
-            transcript = youtube.get_transcript_from_api(yt_url)
-        else:
-            log.info("No YouTube video found for this post.")
+    entries = substack.fetch_rss_entries()
+    posts = [(entry.title.strip(), entry.link.split("?")[0], fix_date_iso(entry.published_parsed)) for entry in entries]
+    existing_titles = load_existing_titles(posts)
 
-        success = notion_client.create_notion_page({
-            "title": title,
-            "date": pub_date,
-            "url": link,
-            "content_blocks": content_blocks,
-            "transcript": transcript,
-            "yt_url": yt_url,
-        })
+    new_posts_count = 0
 
-        if success:
-            log.info("Successfully imported to Notion.")
-            existing_titles.add(normalize_title(title))
+    with ImportPipeline(existing_titles) as pipeline:
+        for title, link, pub_date in posts:
+            if not pipeline.submit(title, import_entry, title, link, pub_date):
+                log.info(f"Skipping (already in DB): {title[:30]}...")
+                continue
 
-        time.sleep(2)
+            log.info(f"New post found: {title}")
+            new_posts_count += 1
 
     if new_posts_count == 0:
         log.info("No new posts found. Database is up to date.")
     else:
-        log.info(f"Imported {new_posts_count} new items.")
-
-    # Also run cover backfill (fast and idempotent)
-    from tasks.fix_covers import run as fix_covers_run
-
-    fix_covers_run()
+        log.info(f"Imported {pipeline.imported} of {new_posts_count} new items.")
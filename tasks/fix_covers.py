@@ -1,47 +1,61 @@
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor
 
-from scraper import notion_client, substack
+from scraper import config, metrics, notion_client, state, substack
 
 log = logging.getLogger(__name__)
 
 
-def run():
-    log.info("--- Starting cover image fixer ---")
+def check_cover(page):
+    """Finds and sets one page's cover. Returns None on success, else why not."""
+    try:
+        image_url = substack.get_substack_cover_image(page["url"])
+        if not image_url:
+            log.info(f"No image found: {page['title'][:40]}")
+            return "no image found"
+        log.info(f"Found image for {page['title'][:40]}: {image_url[:50]}...")
+        if notion_client.set_page_cover(page["page_id"], image_url):
+            return None
+        return "cover update failed"
+    except Exception as e:
+        log.error(f"Error processing page: {e}")
+        return str(e)
 
-    all_pages = notion_client.get_all_notion_pages(
-        {"filter": {"property": "URL", "url": {"is_not_empty": True}}}
-    )
 
-    count = 0
-    for page in all_pages:
-        if page.get("cover"):
-            continue
-
-        try:
-            props = page.get("properties", {})
-            title_list = props.get("Name", {}).get("title", [])
-            if not title_list:
-                continue
-            title = title_list[0].get("plain_text", "Untitled")
+def run():
+    """Sets covers on pages that lack one.
 
-            substack_url = props.get("URL", {}).get("url")
-            if not substack_url:
-                continue
+    Only pages edited since the last run are looked at (covers_watermark),
+    plus earlier failures once their backoff has passed. Up to
+    COVER_WORKERS pages are checked at a time.
+    """
+    log.info("--- Starting cover image fixer ---")
+
+    state.refresh()
 
-            log.info(f"Checking cover: {title[:40]}...")
+    watermark = state.get_meta("covers_watermark")
+    pages = state.pages_missing_cover(since=watermark)
+    log.info(f"{len(pages)} pages to check" + (f" (edited since {watermark})." if watermark else "."))
 
-            image_url = substack.get_substack_cover_image(substack_url)
+    newest = watermark
+    for page in pages:
+        if page["last_edited_time"] and (newest is None or page["last_edited_time"] > newest):
+            newest = page["last_edited_time"]
+    pages = [page for page in pages if page["title"]]
+    metrics.incr("covers_checked", len(pages))
 
-            if image_url:
-                log.info(f"Found image: {image_url[:50]}...")
-                notion_client.set_page_cover(page["id"], image_url)
+    count = 0
+    with ThreadPoolExecutor(max_workers=max(1, config.COVER_WORKERS)) as executor:
+        for page, error in zip(pages, executor.map(check_cover, pages)):
+            if error is None:
+                state.clear_cover_failure(page["page_id"])
+                metrics.incr("covers_updated")
                 count += 1
-                time.sleep(0.5)
-            else:
-                log.info("No image found.")
+                continue
+            retry_at = state.record_cover_failure(page["page_id"], error)
+            log.info(f"Will retry {page['title'][:40]} after {retry_at[:16]}.")
 
-        except Exception as e:
-            log.error(f"Error processing page: {e}")
+    if newest:
+        state.set_meta("covers_watermark", newest)
 
     log.info(f"Cover fixer done. Updated {count} covers.")
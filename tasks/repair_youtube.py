@@ -1,25 +1,26 @@
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor
 
-from scraper import notion_client, substack, youtube
+from scraper import config, metrics, notion_client, state, substack, youtube
 
 log = logging.getLogger(__name__)
 
+# Definite answers that put a page on the re-check schedule: the page
+# loaded and has no video, or its captions are gone (404/410). Failed
+# fetches are anything else and are simply tried again next run.
+MISSES = ("no video", "no transcript")
+# Repaired from Substack's own video: the page gets no YouTube URL, so it
+# is recorded as done rather than left for the next run to repair again.
+NATIVE = "native"
 
-def run():
-    log.info("--- Starting YouTube repair ---")
-
-    incomplete_pages = notion_client.get_incomplete_pages()
 
-    for page in incomplete_pages:
-        page_id = page["id"]
-        try:
-            title = page["properties"]["Name"]["title"][0]["plain_text"]
-            substack_url = page["properties"]["URL"]["url"]
-        except (KeyError, IndexError):
-            continue
-
-        log.info(f"Checking: {title[:40]}...")
+def repair_page(page):
+    """Looks for the post's video and fills it in. Returns None once the
+    page is repaired with a YouTube link, NATIVE once it is repaired from a
+    Substack video, otherwise why it was not."""
+    title = page["title"]
+    substack_url = page["url"]
+    try:
         vid_type, vid_data = substack.find_video_on_substack_page(substack_url)
 
         transcript = ""
@@ -33,14 +34,51 @@ def run():
             is_native = True
             final_url = substack_url
             transcript = youtube.get_transcript_from_vtt_url(vid_data)
+            if transcript is None:
+                return "VTT download failed"
+
+        if not (transcript or vid_type == "youtube"):
+            return "no transcript" if vid_type else "no video"
+        if transcript:
+            log.info(f"Transcript found for {title[:40]} ({len(transcript)} chars)")
+        if not notion_client.update_notion_page(page["page_id"], final_url, transcript, is_native):
+            return "Notion update failed"
+        return NATIVE if is_native else None
+    except Exception as e:
+        log.error(f"Error repairing {title[:40]}: {e}")
+        return str(e)
+
+
+def run():
+    """Fills in videos and transcripts for pages that have none.
+
+    Pages where no video turned up are not looked at again until their
+    re-check time (VIDEO_RECHECK_HOURS, doubling each miss), so a run only
+    visits new pages and the few that are due. Those are checked
+    SYNC_WORKERS at a time.
+    """
+    log.info("--- Starting YouTube repair ---")
+
+    state.refresh()
 
-        if transcript or vid_type == "youtube":
-            if transcript:
-                log.info(f"Transcript found ({len(transcript)} chars)")
-            notion_client.update_notion_page(page_id, final_url, transcript, is_native)
-        else:
-            log.info("No video access. Skipping.")
+    pages = [page for page in state.pages_missing_video() if page["title"]]
+    log.info(f"{len(pages)} pages to check, {state.count_video_checks_waiting()} waiting for a re-check.")
+    metrics.incr("videos_checked", len(pages))
 
-        time.sleep(1)
+    with ThreadPoolExecutor(max_workers=max(1, config.SYNC_WORKERS)) as executor:
+        for page, result in zip(pages, executor.map(repair_page, pages)):
+            if result is None:
+                state.clear_video_miss(page["page_id"])
+                metrics.incr("videos_repaired")
+                continue
+            if result == NATIVE:
+                state.record_native_video(page["page_id"])
+                metrics.incr("videos_repaired")
+                continue
+            if result not in MISSES:
+                log.warning(f"Could not check {page['title'][:40]} ({result}), will try again next run.")
+                continue
+            recheck_at = state.record_video_miss(page["page_id"], result)
+            log.info(f"{result.capitalize()}: {page['title'][:40]}, will look again after {recheck_at[:16]}.")
 
     log.info("YouTube repair complete.")